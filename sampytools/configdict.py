@@ -1,19 +1,52 @@
-from typing import Dict, Any, Union, Optional, Iterable
+import logging
+import pathlib
+import threading
+import weakref
+from types import MappingProxyType
+from typing import Dict, Any, Union, Optional, Iterable, Mapping, Tuple, Callable, List
+
+from sampytools.json_utils import loads_json, dumps_json, read_json_file
 
 
 class NominalToken:
     """
     Nominal token class to represent constant values and can be used as dictionary keys.
     Tokens with the same name are identical in equality comparison.
+
+    Tokens are interned, creating a token with a name that is already in use returns the existing instance,
+    so equality is an identity check and the hash is computed once.
     """
 
+    __slots__ = ("_name", "_hash", "__weakref__")
+
+    _registry: "weakref.WeakValueDictionary[Tuple[type, str], NominalToken]" = weakref.WeakValueDictionary()
+    _registry_lock = threading.Lock()
+
+    def __new__(cls, name: str) -> "NominalToken":
+        """
+        Return the interned token of the name, creating it on first use
+
+        :param name: Token name
+        :return: NominalToken
+        """
+        key = (cls, name)
+        token = cls._registry.get(key)
+        if token is None:
+            with cls._registry_lock:
+                token = cls._registry.get(key)
+                if token is None:
+                    token = super().__new__(cls)
+                    token._name = name
+                    token._hash = hash("NominalToken" + name)
+                    cls._registry[key] = token
+        return token
+
     def __init__(self, name: str) -> None:
         """
         constructor.
 
         :param name: Token name
         """
-        self._name = name
 
     @property
     def name(self) -> str:
@@ -31,8 +64,10 @@ class NominalToken:
         :param other: Value to compare with
         :return: True if the other value is a NominalToken with the same name, else False
         """
+        if self is other:
+            return True
         if isinstance(other, NominalToken):
-            return self._name == other.name
+            return self._name == other._name
         return False
 
     def __hash__(self):
@@ -42,7 +77,15 @@ class NominalToken:
 
         :return: Hashcode
         """
-        return hash("NominalToken" + self.name)
+        return self._hash
+
+    def __reduce__(self):
+        """
+        Pickle by name so that unpickled token is the interned instance
+
+        :return: Class and its arguments
+        """
+        return type(self), (self._name,)
 
     def __repr__(self):
         """
@@ -56,13 +99,82 @@ class NominalToken:
 KeyType = Union[str, NominalToken]
 
 
+_MISSING = object()
+_LOCK_INIT = threading.Lock()
+
+SubscriberType = Callable[[KeyType, Any, Any], None]
+
+
+def _values_differ(old: Any, new: Any) -> bool:
+    """
+    Whether a config value changed, values that cannot be compared (e.g. dataframes) differ unless identical
+
+    :param old: Old value
+    :param new: New value
+    :return: True if the value changed
+    """
+    if old is new:
+        return False
+    try:
+        return bool(old != new)
+    except Exception:
+        return True
+
+
+def _iterate_path_prefixes(path: KeyType) -> Iterable[KeyType]:
+    """
+    Iterate a dot-connected config path and the paths of the sub dictionaries that contain it, deepest first
+
+    :param path: Dot-connected config path
+    :return: generator of paths
+    """
+    yield path
+    if isinstance(path, str):
+        while "." in path:
+            path = path.rpartition(".")[0]
+            yield path
+
+
+def _import_yaml():
+    """
+    Import PyYAML package that is needed only for YAML support
+
+    :return: yaml module
+    """
+    try:
+        import yaml
+    except ImportError as e:
+        raise ImportError("YAML support requires PyYAML package: pip install pyyaml") from e
+    return yaml
+
+
+def _join_path(key: KeyType, sub_key: KeyType) -> str:
+    """
+    Dot-connected config path of a sub key under key
+
+    :param key: Key of the sub dictionary
+    :param sub_key: Key or path inside the sub dictionary
+    :return: Dot-connected config path
+    """
+    return f"{key}.{sub_key}"
+
+
 class ConfigDict:
     """
     ConfigDict is a dictionary-like data structure to set and store multiple level configuration.
     The dictionary itself can be easily serialized into JSON or string format.
+
+    Every level keeps a flat index that maps dot-connected paths to values of its sub tree,
+    so looking up a value, len and in operator do not walk the tree.
+    Reading a missing key returns an empty sub dictionary that is attached to the tree only when something is written to it.
+
+    Reads never take a lock, they look up single keys or iterate over a snapshot of a level,
+    as set and delete change the level in place. Writes are serialized by a lock of the root, and update builds
+    the new state on a copy of the tree and swaps it in, so readers see either all or none of an update.
+    Callbacks subscribed to a path are called with every changed value at or under that path.
     """
 
-    __slots__ = "__dict__"
+    __slots__ = ("_data", "_flat", "_parent", "_key", "_pending", "_lock", "_subscribers", "_changes", "_missing_children", "__weakref__")
 
     def __init__(self, preset: Optional[Dict[KeyType, Any]] = None):
         """
@@ -70,11 +182,386 @@ class ConfigDict:
 
         :param preset: Optional dictionary to load config from
         """
+        object.__setattr__(self, "_data", {})
+        object.__setattr__(self, "_flat", {})
+        object.__setattr__(self, "_parent", None)
+        object.__setattr__(self, "_key", None)
+        object.__setattr__(self, "_pending", None)
+        object.__setattr__(self, "_lock", None)
+        object.__setattr__(self, "_subscribers", {})
+        object.__setattr__(self, "_changes", None)
+        object.__setattr__(self, "_missing_children", None)
         if isinstance(preset, ConfigDict):
             preset = preset.flatten()
         if preset is not None:
             for k, v in preset.items():
-                self[k] = v
+                self._set_path(k, v)
+
+    @classmethod
+    def _detached(cls, parent: "ConfigDict", key: KeyType) -> "ConfigDict":
+        """
+        Create empty sub dictionary that attaches itself to parent on first write
+
+        :param parent: Parent ConfigDict
+        :param key: Key under parent
+        :return: Empty ConfigDict
+        """
+        sub = cls()
+        object.__setattr__(sub, "_parent", parent)
+        object.__setattr__(sub, "_key", key)
+        return sub
+
+    @classmethod
+    def _from_raw(cls, raw: Dict[KeyType, Any], lazy: bool = False) -> "ConfigDict":
+        """
+        Create ConfigDict from nested dictionaries, nested dictionaries become sub dictionaries
+
+        :param raw: Nested dictionaries, for example parsed JSON object
+        :param lazy: Keep nested dictionaries as they are and convert them only on first access
+        :return: ConfigDict
+        """
+        config = cls()
+        if lazy:
+            object.__setattr__(config, "_pending", {})
+        for k, v in raw.items():
+            if not isinstance(v, dict):
+                config._set_direct(k, v)
+            elif lazy:
+                config._pending[k] = v
+            else:
+                config._set_direct(k, cls._from_raw(v))
+        return config
+
+    def _to_raw(self) -> Dict[str, Any]:
+        """
+        Convert to nested dictionaries, nested dictionaries that were never accessed are returned as they were loaded
+
+        :return: Nested dictionaries
+        """
+        raw = {str(k): v._to_raw() if isinstance(v, ConfigDict) else v for k, v in tuple(self._data.items())}
+        pending = self._pending
+        if pending:
+            raw.update((str(k), v) for k, v in tuple(pending.items()))
+        return raw
+
+    def _materialize(self, key: KeyType) -> None:
+        """
+        Convert a nested dictionary that is still waiting for first access into sub dictionary
+
+        :param key: Key of the nested dictionary
+        """
+        root = self._root()
+        with root._get_lock():
+            if not self._pending or key not in self._pending:
+                return
+            # converting a loaded sub tree is not a change of values, so it is not recorded for subscribers
+            changes = root._changes
+            object.__setattr__(root, "_changes", None)
+            try:
+                sub = ConfigDict._from_raw(self._pending.pop(key), lazy=True)
+                object.__setattr__(sub, "_parent", self)
+                object.__setattr__(sub, "_key", key)
+                self._data[key] = sub
+                for sub_path, sub_value in sub._flat.items():
+                    self._propagate(_join_path(key, sub_path), sub_value)
+            finally:
+                object.__setattr__(root, "_changes", changes)
+
+    def _materialize_all(self) -> None:
+        """
+        Convert every nested dictionary of the sub tree that is still waiting for first access
+        """
+        if self._pending is None:
+            return
+        with self._root()._get_lock():
+            while self._pending:
+                self._materialize(next(iter(self._pending)))
+            for value in list(self._data.values()):
+                if isinstance(value, ConfigDict):
+                    value._materialize_all()
+            object.__setattr__(self, "_pending", None)
+
+    def _root(self) -> "ConfigDict":
+        """
+        Top level ConfigDict of the tree
+
+        :return: Root ConfigDict
+        """
+        node = self
+        while node._parent is not None:
+            node = node._parent
+        return node
+
+    def _keys_from_root(self) -> List[KeyType]:
+        """
+        Keys leading from the root to this level
+
+        :return: List of keys
+        """
+        keys = []
+        node = self
+        while node._parent is not None:
+            keys.append(node._key)
+            node = node._parent
+        return keys[::-1]
+
+    def _get_lock(self) -> threading.RLock:
+        """
+        Lock serializing writes of the tree, created on first write
+
+        :return: Reentrant lock
+        """
+        lock = self._lock
+        if lock is None:
+            with _LOCK_INIT:
+                if self._lock is None:
+                    object.__setattr__(self, "_lock", threading.RLock())
+                lock = self._lock
+        return lock
+
+    def _copy_tree(self) -> "ConfigDict":
+        """
+        Copy structure of the sub tree, values are shared
+
+        :return: ConfigDict
+        """
+        copy = ConfigDict()
+        for k, v in self._data.items():
+            if isinstance(v, ConfigDict):
+                v = v._copy_tree()
+                object.__setattr__(v, "_parent", copy)
+                object.__setattr__(v, "_key", k)
+            copy._data[k] = v
+        object.__setattr__(copy, "_flat", dict(self._flat))
+        return copy
+
+    def _write(self, write: Callable[[], None]) -> None:
+        """
+        Apply a write under the lock of the root and notify subscribers of changed values
+
+        :param write: Function doing the write
+        """
+        root = self._root()
+        with root._get_lock():
+            if root._subscribers:
+                object.__setattr__(root, "_changes", [])
+            try:
+                write()
+            finally:
+                changes = root._changes
+                object.__setattr__(root, "_changes", None)
+        if changes:
+            root._notify(changes)
+
+    def _notify(self, changes: List[Tuple[KeyType, Any, Any]]) -> None:
+        """
+        Call subscribers of changed paths, errors of callbacks are logged and do not stop other callbacks
+
+        :param changes: (path, old value, new value) recorded by a write, in order, missing values are _MISSING
+        """
+        subscribers = self._subscribers
+        merged = {}
+        for path, old_value, new_value in changes:
+            if path in merged:
+                old_value = merged[path][0]
+            merged[path] = (old_value, new_value)
+        for path, (old_value, new_value) in merged.items():
+            if old_value is _MISSING and new_value is _MISSING or not _values_differ(old_value, new_value):
+                continue
+            old_value = None if old_value is _MISSING else old_value
+            new_value = None if new_value is _MISSING else new_value
+            for subscribed_path in _iterate_path_prefixes(path):
+                for callback in subscribers.get(subscribed_path, ()):
+                    try:
+                        callback(path, old_value, new_value)
+                    except Exception:
+                        logging.exception(f"subscriber of {subscribed_path} failed on change of {path}")
+
+    def _missing_child(self, key: KeyType) -> "ConfigDict":
+        """
+        Empty sub dictionary returned for a missing key, every read of the key returns the same one until it is written to,
+        so writes through any of them end up in the same sub dictionary
+
+        :param key: Missing key
+        :return: Detached ConfigDict
+        """
+        children = self._missing_children
+        if children is None:
+            children = weakref.WeakValueDictionary()
+            object.__setattr__(self, "_missing_children", children)
+        sub = children.get(key)
+        if sub is None or sub._parent is not self:
+            sub = ConfigDict._detached(self, key)
+            children[key] = sub
+        return sub
+
+    def _live(self) -> "Optional[ConfigDict]":
+        """
+        Sub dictionary that writes to this one should go to, attaching this one to the tree if its key is still missing
+
+        :return: This ConfigDict, the ConfigDict that was stored under the key meanwhile,
+            or None if a plain value was stored under the key meanwhile
+        """
+        if self._is_attached():
+            return self
+        parent = self._parent._live()
+        if parent is None:
+            return None
+        existing = parent._data.get(self._key, _MISSING)
+        if isinstance(existing, ConfigDict):
+            return existing
+        if existing is not _MISSING:
+            return None
+        object.__setattr__(self, "_parent", parent)
+        parent._set_direct(self._key, self)
+        return self
+
+    def _is_attached(self) -> bool:
+        """
+        Whether this is the root or a sub dictionary stored in its parent
+        """
+        return self._parent is None or self._parent._data.get(self._key) is self
+
+    def _propagate(self, path: KeyType, value: Any = _MISSING) -> None:
+        """
+        Set (or remove when value is missing) a path in flat index of this level and of every ancestor
+
+        :param path: Path relative to this level
+        :param value: Value of the path
+        """
+        node = self
+        while True:
+            if node._parent is None and node._changes is not None:
+                node._changes.append((path, node._flat.get(path, _MISSING), value))
+            if value is _MISSING:
+                node._flat.pop(path, None)
+            else:
+                node._flat[path] = value
+            if node._parent is None or not node._is_attached():
+                return
+            path = _join_path(node._key, path)
+            node = node._parent
+
+    def _set_direct(self, key: KeyType, value: Any) -> None:
+        """
+        Set value of a key of this level and update flat indexes
+
+        :param key: Key
+        :param value: Value
+        """
+        if not self._is_attached():
+            live = self._live()
+            if live is None:
+                # a plain value replaced the missing key, like any sub dictionary replaced by a value
+                # this one is no longer part of the tree
+                object.__setattr__(self, "_parent", None)
+                object.__setattr__(self, "_key", None)
+            elif live is not self:
+                live._set_direct(key, value)
+                return
+        if self._pending:
+            self._pending.pop(key, None)
+        old = self._data.get(key, _MISSING)
+        if old is value:
+            return
+        if isinstance(old, ConfigDict):
+            for sub_path in old._flat:
+                self._propagate(_join_path(key, sub_path))
+            object.__setattr__(old, "_parent", None)
+            object.__setattr__(old, "_key", None)
+        elif old is not _MISSING:
+            self._propagate(key)
+        if isinstance(value, ConfigDict):
+            if value._parent is not None and not (value._parent is self and value._key == key):
+                value = ConfigDict(value)
+            value._materialize_all()
+            object.__setattr__(value, "_parent", self)
+            object.__setattr__(value, "_key", key)
+            self._data[key] = value
+            for sub_path, sub_value in value._flat.items():
+                self._propagate(_join_path(key, sub_path), sub_value)
+        else:
+            self._data[key] = value
+            self._propagate(key, value)
+
+    def _del_direct(self, key: KeyType) -> None:
+        """
+        Delete a key of this level and update flat indexes
+
+        :param key: Key to delete
+        """
+        old = self._data.pop(key)
+        if isinstance(old, ConfigDict):
+            for sub_path in old._flat:
+                self._propagate(_join_path(key, sub_path))
+            object.__setattr__(old, "_parent", None)
+            object.__setattr__(old, "_key", None)
+        else:
+            self._propagate(key)
+
+    @classmethod
+    def from_json(cls, source: Union[str, bytes, pathlib.Path], lazy: bool = False) -> "ConfigDict":
+        """
+        Load configuration from JSON, with orjson when it is installed and with stdlib json otherwise.
+        Nested JSON objects become sub dictionaries
+
+        :param source: JSON file path, or JSON document as text or bytes
+        :param lazy: Convert nested JSON objects into sub dictionaries only when they are first accessed
+        :return: ConfigDict
+        """
+        if isinstance(source, pathlib.Path):
+            raw = read_json_file(source)
+        else:
+            raw = loads_json(source)
+        if not isinstance(raw, dict):
+            raise ValueError(f"ConfigDict can only be loaded from a JSON object, got {type(raw).__name__}")
+        return cls._from_raw(raw, lazy)
+
+    def to_json(self, file: Optional[pathlib.Path] = None, indent: bool = False) -> str:
+        """
+        Serialize configuration to JSON with nested objects for sub dictionaries
+
+        :param file: Optional file path to save JSON to
+        :param indent: Indent nested objects with 2 spaces
+        :return: JSON text
+        """
+        text = dumps_json(self._to_raw(), indent=indent)
+        if file is not None:
+            file.write_text(text, encoding="utf-8")
+        return text
+
+    @classmethod
+    def from_yaml(cls, source: Union[str, pathlib.Path], lazy: bool = False) -> "ConfigDict":
+        """
+        Load configuration from YAML, needs PyYAML package and uses its C loader when available.
+        Nested mappings become sub dictionaries
+
+        :param source: YAML file path or YAML document
+        :param lazy: Convert nested mappings into sub dictionaries only when they are first accessed
+        :return: ConfigDict
+        """
+        yaml = _import_yaml()
+        if isinstance(source, pathlib.Path):
+            source = source.read_text(encoding="utf-8")
+        raw = yaml.load(source, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
+        if not isinstance(raw, dict):
+            raise ValueError(f"ConfigDict can only be loaded from a YAML mapping, got {type(raw).__name__}")
+        return cls._from_raw(raw, lazy)
+
+    def to_yaml(self, file: Optional[pathlib.Path] = None) -> str:
+        """
+        Serialize configuration to YAML with nested mappings for sub dictionaries, needs PyYAML package
+
+        :param file: Optional file path to save YAML to
+        :return: YAML text
+        """
+        yaml = _import_yaml()
+        text = yaml.dump(
+            self._to_raw(), Dumper=getattr(yaml, "CSafeDumper", yaml.SafeDumper), sort_keys=False, allow_unicode=True
+        )
+        if file is not None:
+            file.write_text(text, encoding="utf-8")
+        return text
 
     def flatten(self) -> Dict[KeyType, Any]:
         """
@@ -83,18 +570,8 @@ class ConfigDict:
         :return: A single level dictionary that maps dot-connected config path to their values.
         Empty sub-dictionary will be removed
         """
-        result: Dict[KeyType, Any] = {}
-        for k, v in [*self.__dict__.items()]:
-            if isinstance(v, ConfigDict):
-                sub = v.flatten()
-                if not len(sub):
-                    del self.__dict__[k]
-                else:
-                    for sub_k, sub_v in sub.items():
-                        result[f"{k}.{sub_k}"] = sub_v
-            else:
-                result[k] = v
-        return result
+        self._materialize_all()
+        return dict(self._flat)
 
     def get(self, key: KeyType, default: Any = None) -> Any:
         """
@@ -104,6 +581,9 @@ class ConfigDict:
         :param default: Optional default value, by default is None
         :return: Configuration value
         """
+        item = self._flat.get(key, _MISSING)
+        if item is not _MISSING:
+            return item
         item = self[key]
         if isinstance(item, ConfigDict):
             return default
@@ -111,15 +591,104 @@ class ConfigDict:
 
     def update(self, another: "Union[ConfigDict, Dict[KeyType, Any]]") -> None:
         """
-        Update configuration from another ConfigDict or a dictionary
+        Update configuration from another ConfigDict or a dictionary.
+        Applied atomically: the new state is built on a copy of the tree and swapped into the existing sub dictionaries,
+        so readers of the root see either all or none of the changes and sub dictionaries fetched before the update
+        stay part of the tree
 
         :param another: Another ConfigDict or a dictionary that maps string to values
         """
         override = another
         if isinstance(another, ConfigDict):
             override = another.flatten()
-        for k, v in override.items():
-            self[k] = v
+        root, keys = self._root(), self._keys_from_root()
+        with root._get_lock():
+            root._materialize_all()
+            new_root = root._copy_tree()
+            target = new_root
+            for key in keys:
+                sub = target._data.get(key)
+                target = sub if isinstance(sub, ConfigDict) else target._missing_child(key)
+            if root._subscribers:
+                object.__setattr__(new_root, "_changes", [])
+            for k, v in override.items():
+                target._set_path(k, v)
+            changes = new_root._changes
+            swaps = []
+            ConfigDict._collect_state_swaps(root, new_root, swaps)
+            for node, data, flat in swaps:
+                object.__setattr__(node, "_data", data)
+                object.__setattr__(node, "_flat", flat)
+        if changes:
+            root._notify(changes)
+
+    @staticmethod
+    def _collect_state_swaps(
+        old: "ConfigDict", new: "ConfigDict", swaps: List[Tuple["ConfigDict", Dict[KeyType, Any], Dict[KeyType, Any]]]
+    ) -> None:
+        """
+        Match updated copy of a tree with the tree, so that existing sub dictionaries keep their identity
+        and only get new keys, values and flat index. A sub dictionary created by the update under a key that was missing
+        is replaced by the one returned for that missing key, if it is still in use. Deepest levels come first in swaps
+
+        :param old: Existing ConfigDict
+        :param new: Updated copy of it
+        :param swaps: List to append (existing ConfigDict, new data, new flat index) to
+        """
+        data = {}
+        for k, v in new._data.items():
+            if isinstance(v, ConfigDict):
+                existing = old._data.get(k, _MISSING)
+                if existing is _MISSING and old._missing_children is not None:
+                    existing = old._missing_children.get(k, _MISSING)
+                    if existing is not _MISSING and existing._parent is not old:
+                        existing = _MISSING
+                if isinstance(existing, ConfigDict):
+                    ConfigDict._collect_state_swaps(existing, v, swaps)
+                    v = existing
+                else:
+                    object.__setattr__(v, "_parent", old)
+            data[k] = v
+        swaps.append((old, data, new._flat))
+
+    def subscribe(self, path: KeyType, callback: SubscriberType) -> Callable[[], None]:
+        """
+        Register callback that is called as callback(changed_path, old_value, new_value) after a value at path
+        or under path changes. Old or new value is None when the path is added or removed
+
+        :param path: Dot-connected config path relative to this level
+        :param callback: Function to call
+        :return: Function that unsubscribes the callback
+        """
+        root = self._root()
+        for key in reversed(self._keys_from_root()):
+            path = _join_path(key, path)
+        with root._get_lock():
+            subscribers = dict(root._subscribers)
+            subscribers[path] = subscribers.get(path, ()) + (callback,)
+            object.__setattr__(root, "_subscribers", subscribers)
+
+        def unsubscribe() -> None:
+            with root._get_lock():
+                subscribers = dict(root._subscribers)
+                callbacks = tuple(c for c in subscribers.get(path, ()) if c is not callback)
+                if callbacks:
+                    subscribers[path] = callbacks
+                else:
+                    subscribers.pop(path, None)
+                object.__setattr__(root, "_subscribers", subscribers)
+
+        return unsubscribe
+
+    def freeze(self) -> "FrozenConfigDict":
+        """
+        Take an immutable snapshot of the configuration.
+        The snapshot is hashable (if all values are hashable), safe to share across threads and cheap to pickle
+
+        :return: FrozenConfigDict with the current values
+        """
+        self._materialize_all()
+        return FrozenConfigDict(self._flat)
 
     def __getitem__(self, key: KeyType):
         """
@@ -128,29 +697,54 @@ class ConfigDict:
         :param key: Key
         :return: Value
         """
+        item = self._flat.get(key, _MISSING)
+        if item is not _MISSING:
+            return item
+        item = self._data.get(key, _MISSING)
+        if item is not _MISSING:
+            return item
+        if self._pending and key in self._pending:
+            self._materialize(key)
+            return self._data[key]
         if isinstance(key, str) and "." in key:
-            p = key.split(".")
-            if p[0] not in self.__dict__:
-                self.__dict__[p[0]] = ConfigDict()
-            return self.__dict__[p[0]][".".join(p[1:])]
-        if key not in self.__dict__:
-            self.__dict__[key] = ConfigDict()
-        return self.__dict__[key]
+            head, rest = key.split(".", 1)
+            if self._pending and head in self._pending:
+                self._materialize(head)
+            sub = self._data.get(head, _MISSING)
+            if sub is _MISSING:
+                sub = self._missing_child(head)
+            return sub[rest]
+        return self._missing_child(key)
 
     def __setitem__(self, key: KeyType, value):
         """
         Set the value to the key
 
+        :param key: Key
+        :param value: Value
+        """
+        self._write(lambda: self._set_path(key, value))
+
+    def _set_path(self, key: KeyType, value: Any) -> None:
+        """
+        Set the value to the dot-connected config path without locking
+
         :param key: Key
         :param value: Value
         """
         if isinstance(key, str) and "." in key:
-            p = key.split(".")
-            if p[0] not in self.__dict__:
-                self.__dict__[p[0]] = ConfigDict()
-            self.__dict__[p[0]][".".join(p[1:])] = value
+            head, rest = key.split(".", 1)
+            if self._pending and head in self._pending:
+                self._materialize(head)
+            sub = self._data.get(head, _MISSING)
+            if sub is _MISSING:
+                sub = self._missing_child(head)
+            if isinstance(sub, ConfigDict):
+                sub._set_path(rest, value)
+            else:
+                sub[rest] = value
             return
-        self.__dict__[key] = value
+        self._set_direct(key, value)
 
     def __delitem__(self, key: KeyType):
         """
@@ -158,14 +752,31 @@ class ConfigDict:
 
         :param key: Key to delete
         """
-        if key in self.__dict__:
-            del self.__dict__[key]
+        self._write(lambda: self._del_path(key))
+
+    def _del_path(self, key: KeyType) -> None:
+        """
+        Delete the dot-connected config path without locking
+
+        :param key: Key to delete
+        """
+        if self._pending and key in self._pending:
+            del self._pending[key]
+            return
+
+        if key in self._data:
+            self._del_direct(key)
             return
 
         if isinstance(key, str) and "." in key:
-            p = key.split(".")
-            if p[0] in self.__dict__:
-                del self.__dict__[p[0]][".".join(p[1:])]
+            head, rest = key.split(".", 1)
+            if self._pending and head in self._pending:
+                self._materialize(head)
+            sub = self._data.get(head, _MISSING)
+            if isinstance(sub, ConfigDict):
+                sub._del_path(rest)
+            elif sub is not _MISSING:
+                del sub[rest]
 
     def __getattr__(self, key: str):
         """
@@ -174,6 +785,8 @@ class ConfigDict:
         :param key: Key
         :return: Value
         """
+        if key.startswith("__") and key.endswith("__"):
+            raise AttributeError(key)
         return self[key]
 
     def __setattr__(self, key: str, value):
@@ -193,13 +806,244 @@ class ConfigDict:
         """
         del self[key]
 
+    def __getstate__(self):
+        """
+        State for pickle and copy, sub dictionaries are pickled with their own state
+
+        :return: Keys and values of this level
+        """
+        self._materialize_all()
+        return dict(self._data)
+
+    def __setstate__(self, state):
+        """
+        Restore state from pickle and copy, and rebuild flat index
+
+        :param state: Keys and values of this level
+        """
+        object.__setattr__(self, "_data", {})
+        object.__setattr__(self, "_flat", {})
+        object.__setattr__(self, "_parent", None)
+        object.__setattr__(self, "_key", None)
+        object.__setattr__(self, "_pending", None)
+        object.__setattr__(self, "_lock", None)
+        object.__setattr__(self, "_subscribers", {})
+        object.__setattr__(self, "_changes", None)
+        object.__setattr__(self, "_missing_children", None)
+        for k, v in state.items():
+            self._set_direct(k, v)
+
+    def __repr__(self):
+        """
+        String representation
+
+        :return: String representation
+        """
+        self._materialize_all()
+        return dict(self._flat).__repr__()
+
+    def __len__(self):
+        """
+        override __len__
+
+        :return: Numbers of keys stored
+        """
+        self._materialize_all()
+        return len(self._flat)
+
+    def __contains__(self, key: KeyType):
+        """
+        override in operator.
+
+        :param key: Key to check
+        :return: True if the key exists
+        """
+        if key in self._data or key in self._flat:
+            return True
+        if self._pending is None:
+            return False
+        self._materialize_all()
+        return key in self._data or key in self._flat
+
+    def __dir__(self) -> Iterable[str]:
+        """
+        override dir()
+
+        :return: Key to existing elements and methods
+        """
+        self._materialize_all()
+        yield from ("get", "flatten", "update", "subscribe", "freeze", "to_json", "to_yaml")
+        for key, value in tuple(self._data.items()):
+            if not isinstance(value, ConfigDict) or len(value):
+                yield str(key)
+
+
+class FrozenConfigDict:
+    """
+    Immutable snapshot of a ConfigDict.
+    Flattened form, sub snapshots and hash are computed once and cached,
+    and it is pickled as a flat tuple of (path, value) pairs, so it can be used as memoization key and sent to worker processes.
+    """
+
+    __slots__ = ("_items", "_flat", "_prefixes", "_subs", "_hash")
+
+    def __init__(self, preset: Optional[Union[Mapping[KeyType, Any], Iterable[Tuple[KeyType, Any]]]] = None):
+        """
+        constructor.
+
+        :param preset: Optional ConfigDict, dictionary that maps dot-connected config path to values or iterable of (path, value) pairs
+        """
+        if isinstance(preset, (ConfigDict, FrozenConfigDict)):
+            preset = preset.flatten()
+        if preset is None:
+            items = ()
+        elif isinstance(preset, Mapping):
+            items = tuple(preset.items())
+        else:
+            items = tuple(preset)
+        prefixes = set()
+        for path, _ in items:
+            if isinstance(path, str):
+                head, _, _ = path.rpartition(".")
+                while head:
+                    prefixes.add(head)
+                    head, _, _ = head.rpartition(".")
+        object.__setattr__(self, "_items", items)
+        object.__setattr__(self, "_flat", MappingProxyType(dict(items)))
+        object.__setattr__(self, "_prefixes", frozenset(prefixes))
+        object.__setattr__(self, "_subs", {})
+        object.__setattr__(self, "_hash", None)
+
+    def flatten(self) -> Mapping[KeyType, Any]:
+        """
+        Cached flat version of itself.
+
+        :return: Read-only mapping from dot-connected config path to their values
+        """
+        return self._flat
+
+    def get(self, key: KeyType, default: Any = None) -> Any:
+        """
+        Try to get value for a specific config path and return default value if not found or the value is a sub dictionary
+
+        :param key: Dot-connected config path
+        :param default: Optional default value, by default is None
+        :return: Configuration value
+        """
+        return self._flat.get(key, default)
+
+    def thaw(self) -> ConfigDict:
+        """
+        Create a mutable ConfigDict with the same values
+
+        :return: ConfigDict
+        """
+        return ConfigDict(self._flat)
+
+    def __getitem__(self, key: KeyType):
+        """
+        Get the value or the sub snapshot assigned to the key
+
+        :param key: Key
+        :return: Value or FrozenConfigDict of the sub dictionary
+        """
+        item = self._flat.get(key, _MISSING)
+        if item is not _MISSING:
+            return item
+        if key not in self._prefixes:
+            raise KeyError(key)
+        sub = self._subs.get(key)
+        if sub is None:
+            prefix = key + "."
+            sub = FrozenConfigDict(
+                (path[len(prefix):], value)
+                for path, value in self._items
+                if isinstance(path, str) and path.startswith(prefix)
+            )
+            self._subs[key] = sub
+        return sub
+
+    def __getattr__(self, key: str):
+        """
+        Get the value or the sub snapshot assigned to the key
+
+        :param key: Key
+        :return: Value or FrozenConfigDict of the sub dictionary
+        """
+        try:
+            return self[key]
+        except KeyError:
+            raise AttributeError(key) from None
+
+    def __setattr__(self, key: str, value):
+        """
+        FrozenConfigDict is immutable
+
+        :raises TypeError: always
+        """
+        raise TypeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, key: str):
+        """
+        FrozenConfigDict is immutable
+
+        :raises TypeError: always
+        """
+        raise TypeError(f"{type(self).__name__} is immutable")
+
+    def __setitem__(self, key: KeyType, value):
+        """
+        FrozenConfigDict is immutable
+
+        :raises TypeError: always
+        """
+        raise TypeError(f"{type(self).__name__} is immutable")
+
+    def __delitem__(self, key: KeyType):
+        """
+        FrozenConfigDict is immutable
+
+        :raises TypeError: always
+        """
+        raise TypeError(f"{type(self).__name__} is immutable")
+
+    def __reduce__(self):
+        """
+        Pickle as the flat tuple of (path, value) pairs
+
+        :return: Constructor and its arguments
+        """
+        return FrozenConfigDict, (self._items,)
+
+    def __eq__(self, other: Any):
+        """
+        Override '==' and '!=' operator
+
+        :param other: Value to compare with
+        :return: True if the other value is a FrozenConfigDict with the same values, else False
+        """
+        if isinstance(other, FrozenConfigDict):
+            return self._flat == other._flat
+        return False
+
+    def __hash__(self):
+        """
+        Override hash().
+        Computed on first call and cached, raises TypeError if some value is not hashable
+
+        :return: Hashcode
+        """
+        if self._hash is None:
+            object.__setattr__(self, "_hash", hash(frozenset(self._items)))
+        return self._hash
+
     def __repr__(self):
         """
         String representation
 
         :return: String representation
         """
-        return self.flatten().__repr__()
+        return f"{type(self).__name__}({dict(self._flat)!r})"
 
     def __len__(self):
         """
@@ -207,7 +1051,7 @@ class ConfigDict:
 
         :return: Numbers of keys stored
         """
-        return len(self.flatten())
+        return len(self._items)
 
     def __contains__(self, key: KeyType):
         """
@@ -216,7 +1060,7 @@ class ConfigDict:
         :param key: Key to check
         :return: True if the key exists
         """
-        return key in self.__dict__ or key in self.flatten()
+        return key in self._flat or key in self._prefixes
 
     def __dir__(self) -> Iterable[str]:
         """
@@ -224,7 +1068,6 @@ class ConfigDict:
 
         :return: Key to existing elements and methods
         """
-        yield from ("get", "flatten", "update")
-        self.flatten()
-        for key in self.__dict__:
-            yield str(key)
+        yield from ("get", "flatten", "thaw")
+        for path in self._flat:
+            yield str(path).split(".", 1)[0]
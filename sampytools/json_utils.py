@@ -1,5 +1,53 @@
+import gzip
+import itertools
 import json
+import logging
 import pathlib
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Union, Iterator, Iterable, List, Optional, TextIO
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_LINES_SUFFIXES = (".jsonl", ".ndjson")
+_NUMBER_TAIL_PATTERN = re.compile(r"[0-9.eE+-]*")
+
+
+def loads_json(data: Union[str, bytes]) -> Any:
+    """
+    Parse JSON document, with orjson when it is installed and with stdlib json otherwise
+    Documents orjson rejects but stdlib json accepts (NaN, Infinity) are parsed with stdlib json, so results do not depend
+    on whether orjson is installed
+    :param data: JSON document as text or UTF-8 bytes
+    :return: parsed object
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(data)
+
+
+def dumps_json(obj: Any, indent: bool = False) -> str:
+    """
+    Serialize object to JSON text, with orjson when it is installed and with stdlib json otherwise
+    Both produce the same text: compact separators (or 2 space indent), non-ASCII characters as is
+    and non-string dictionary keys converted to strings
+    :param obj: object to serialize
+    :param indent: indent nested structures with 2 spaces
+    :return: JSON text
+    """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(obj, option=option).decode("utf-8")
+    if indent:
+        return json.dumps(obj, ensure_ascii=False, indent=2)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
 
 
 def read_json_file(json_filepath: pathlib.Path, encoding: str = "utf-8") -> dict:
@@ -9,4 +57,271 @@ def read_json_file(json_filepath: pathlib.Path, encoding: str = "utf-8") -> dict
     :param encoding:
     :return:
     """
-    return json.loads(json_filepath.read_text(encoding=encoding))
+    if encoding.lower().replace("-", "").replace("_", "") == "utf8":
+        return loads_json(json_filepath.read_bytes())
+    return loads_json(json_filepath.read_text(encoding=encoding))
+
+
+def open_json_file(json_filepath: pathlib.Path, encoding: str = "utf-8") -> TextIO:
+    """
+    Open JSON or JSON Lines file for reading as text, gzip compressed files (.gz) are decompressed on the fly
+    :param json_filepath:
+    :param encoding:
+    :return: file object opened in text mode
+    """
+    if json_filepath.suffix.lower() == ".gz":
+        return gzip.open(json_filepath, "rt", encoding=encoding)
+    return open(json_filepath, "r", encoding=encoding)
+
+
+def _is_json_lines(json_filepath: pathlib.Path, f: TextIO) -> bool:
+    """
+    Decide whether file is JSON Lines from its suffix, or else from its first non-whitespace character
+    :param json_filepath:
+    :param f: file object at its start, rewound after peeking
+    :return: True for JSON Lines, False for JSON array
+    """
+    suffixes = [suffix.lower() for suffix in json_filepath.suffixes]
+    if suffixes and suffixes[-1] == ".gz":
+        suffixes.pop()
+    if suffixes and suffixes[-1] in JSON_LINES_SUFFIXES:
+        return True
+    first_char = " "
+    while first_char and first_char.isspace():
+        first_char = f.read(1)
+    f.seek(0)
+    return first_char != "["
+
+
+def _iterate_json_lines(f: TextIO) -> Iterator[Any]:
+    """
+    Parse JSON Lines one line at a time, skipping blank lines
+    :param f: file object opened in text mode
+    :return: generator of records
+    """
+    for line in f:
+        if line.strip():
+            yield loads_json(line)
+
+
+def _iterate_json_array_items(f: TextIO, chunk_size: int) -> Iterator[Any]:
+    """
+    Parse items of a top level JSON array incrementally, keeping only unparsed text in memory
+    Items are decoded with json.JSONDecoder.raw_decode, an item that is cut by the end of the buffer (including a number
+    that is followed only by number characters, e.g. "1." of "1.5") is decoded again after reading more text, and the read size grows with the buffer so large items are not decoded too many times
+    :param f: file object opened in text mode
+    :param chunk_size: number of characters to read at once
+    :return: generator of items
+    """
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = "", 0, False
+    expect_item, empty = True, True
+    opened = False
+    while True:
+        while pos < len(buffer) and buffer[pos].isspace():
+            pos += 1
+        if pos == len(buffer):
+            if eof:
+                raise ValueError("unexpected end of JSON array")
+            chunk = f.read(max(chunk_size, len(buffer) - pos))
+            buffer, pos, eof = buffer[pos:] + chunk, 0, not chunk
+            continue
+        char = buffer[pos]
+        if not opened:
+            if char != "[":
+                raise ValueError(f"expected JSON array, found {char!r}")
+            opened = True
+            pos += 1
+            continue
+        if char == "]" and (empty or not expect_item):
+            return
+        if not expect_item:
+            if char != ",":
+                raise ValueError(f"expected ',' or ']' in JSON array, found {char!r}")
+            expect_item = True
+            pos += 1
+            continue
+        try:
+            item, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            end = len(buffer)
+        if not eof and _NUMBER_TAIL_PATTERN.fullmatch(buffer, end):
+            # item may continue after the buffer, e.g. a number or a cut object
+            chunk = f.read(max(chunk_size, len(buffer) - pos))
+            buffer, pos, eof = buffer[pos:] + chunk, 0, not chunk
+            continue
+        yield item
+        pos = end
+        expect_item, empty = False, False
+
+
+def iterate_json_records(
+    json_filepath: pathlib.Path, encoding: str = "utf-8", json_lines: Optional[bool] = None, chunk_size: int = 1 << 20
+) -> Iterator[Any]:
+    """
+    Iterate records of a JSON array file or a JSON Lines file without loading the whole file into memory
+    :param json_filepath: .json, .jsonl or .ndjson file, optionally gzip compressed (.gz)
+    :param encoding:
+    :param json_lines: True for JSON Lines, False for JSON array, None to infer from suffix or first character
+    :param chunk_size: number of characters to read at once from JSON array file
+    :return: generator of records
+    """
+    with open_json_file(json_filepath, encoding) as f:
+        if json_lines is None:
+            json_lines = _is_json_lines(json_filepath, f)
+        if json_lines:
+            yield from _iterate_json_lines(f)
+        else:
+            yield from _iterate_json_array_items(f, chunk_size)
+
+
+def iterate_json_record_batches(
+    json_filepath: pathlib.Path,
+    batch_size: int = 10_000,
+    encoding: str = "utf-8",
+    json_lines: Optional[bool] = None,
+    chunk_size: int = 1 << 20,
+) -> Iterator[List[Any]]:
+    """
+    Iterate lists of at most batch_size records of a JSON array file or a JSON Lines file
+    :param json_filepath: .json, .jsonl or .ndjson file, optionally gzip compressed (.gz)
+    :param batch_size: maximum number of records per batch
+    :param encoding:
+    :param json_lines: True for JSON Lines, False for JSON array, None to infer from suffix or first character
+    :param chunk_size: number of characters to read at once from JSON array file
+    :return: generator of record lists
+    """
+    if batch_size < 1:
+        raise ValueError(f"batch_size must be positive, got {batch_size}")
+    records = iterate_json_records(json_filepath, encoding=encoding, json_lines=json_lines, chunk_size=chunk_size)
+    while True:
+        batch = list(itertools.islice(records, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def iterate_json_dataframes(
+    json_filepath: pathlib.Path,
+    batch_size: int = 10_000,
+    encoding: str = "utf-8",
+    json_lines: Optional[bool] = None,
+    chunk_size: int = 1 << 20,
+):
+    """
+    Iterate dataframes of at most batch_size rows built from records of a JSON array file or a JSON Lines file
+    Memory use is bounded by the batch size, not by the file size
+    :param json_filepath: .json, .jsonl or .ndjson file, optionally gzip compressed (.gz)
+    :param batch_size: maximum number of rows per dataframe
+    :param encoding:
+    :param json_lines: True for JSON Lines, False for JSON array, None to infer from suffix or first character
+    :param chunk_size: number of characters to read at once from JSON array file
+    :return: generator of dataframes
+    """
+    # pandas is imported here so that configdict can use json_utils without loading pandas
+    import pandas as pd
+
+    for batch in iterate_json_record_batches(json_filepath, batch_size, encoding, json_lines, chunk_size):
+        yield pd.DataFrame.from_records(batch)
+
+
+def _read_json_file_to_frame(json_filepath: pathlib.Path, encoding: str, use_arrow: bool, source_col_name: Optional[str]):
+    """
+    Parse one JSON array or JSON Lines file into a dataframe (or an Arrow table), catching errors
+    Returning column blocks instead of per-record dicts keeps the result cheap to send back from a worker process
+    :param json_filepath:
+    :param encoding:
+    :param use_arrow: build pyarrow Table instead of pandas DataFrame
+    :param source_col_name: optional column to store file name in
+    :return: tuple of (dataframe or table or None, row count, seconds, error message or None)
+    """
+    start = time.perf_counter()
+    try:
+        with open_json_file(json_filepath, encoding) as f:
+            if _is_json_lines(json_filepath, f):
+                records = list(_iterate_json_lines(f))
+            else:
+                records = loads_json(f.read())
+                if not isinstance(records, list):
+                    raise ValueError(f"expected JSON array or JSON Lines, got {type(records).__name__}")
+        if use_arrow:
+            import pyarrow as pa
+
+            frame = pa.Table.from_pylist(records)
+            if source_col_name is not None:
+                frame = frame.append_column(source_col_name, pa.array([json_filepath.name] * len(records)))
+        else:
+            import pandas as pd
+
+            frame = pd.DataFrame.from_records(records)
+            if source_col_name is not None:
+                frame[source_col_name] = json_filepath.name
+        return frame, len(records), time.perf_counter() - start, None
+    except Exception as e:
+        return None, 0, time.perf_counter() - start, f"{type(e).__name__}: {e}"
+
+
+def read_json_files_to_dataframe(
+    json_files: Union[pathlib.Path, Iterable[pathlib.Path]],
+    pattern: str = "*.json*",
+    n_jobs: int = None,
+    encoding: str = "utf-8",
+    use_arrow: bool = False,
+    source_col_name: Optional[str] = None,
+):
+    """
+    Parse many JSON array or JSON Lines files (optionally gzip compressed) and concatenate them into one dataframe
+    Files are parsed in worker processes, each worker returns a whole dataframe (or Arrow table with use_arrow, needs pyarrow)
+    so records are never pickled one dict at a time. A file that fails to parse is skipped and reported in errors
+    :param json_files: folder to glob pattern in, or iterable of files
+    :param pattern: glob pattern of files when json_files is a folder
+    :param n_jobs: number of processes to parse with, by default parse in current process
+    :param encoding:
+    :param use_arrow: build and concatenate pyarrow Tables in workers, then convert to pandas once
+    :param source_col_name: optional column to store file name of each row in
+    :return: ConfigDict with dataframe, file_stats dataframe (file, rows, seconds, error) and errors dict of file to message
+    """
+    # pandas and configdict are imported here so that configdict can use json_utils without loading pandas
+    import pandas as pd
+    from sampytools.configdict import ConfigDict
+
+    if use_arrow:
+        try:
+            import pyarrow as pa
+        except ImportError as e:
+            raise ImportError("use_arrow requires pyarrow package: pip install pyarrow") from e
+    if isinstance(json_files, pathlib.Path):
+        json_files = sorted(json_files.glob(pattern))
+    else:
+        json_files = list(json_files)
+    args = (
+        json_files,
+        itertools.repeat(encoding),
+        itertools.repeat(use_arrow),
+        itertools.repeat(source_col_name),
+    )
+    if n_jobs is None or n_jobs == 1 or len(json_files) <= 1:
+        results = list(map(_read_json_file_to_frame, *args))
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            results = list(executor.map(_read_json_file_to_frame, *args))
+
+    frames = [frame for frame, _, _, error in results if error is None]
+    file_stats = pd.DataFrame(
+        [(str(afile), rows, seconds, error) for afile, (_, rows, seconds, error) in zip(json_files, results)],
+        columns=["file", "rows", "seconds", "error"],
+    )
+    errors = {str(afile): error for afile, (_, _, _, error) in zip(json_files, results) if error is not None}
+    if not frames:
+        df = pd.DataFrame()
+    elif use_arrow:
+        df = pa.concat_tables(frames, promote_options="default").to_pandas()
+    else:
+        df = pd.concat(frames, ignore_index=True)
+    logging.info(
+        f"read {len(df)} rows from {len(json_files) - len(errors)} of {len(json_files)} files "
+        f"in {file_stats['seconds'].sum():.2f} worker seconds, {len(errors)} files failed"
+    )
+    return ConfigDict({"dataframe": df, "file_stats": file_stats, "errors": errors})
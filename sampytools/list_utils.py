@@ -62,7 +62,8 @@ def get_list_diff(list1: list, list2: list):
     :param list2:
     :return:
     """
-    return list(dict.fromkeys(item for item in list1 if item not in set(list2)))
+    set2 = set(list2)
+    return list(dict.fromkeys(item for item in list1 if item not in set2))
 
 
 def print_list_items(mylist):
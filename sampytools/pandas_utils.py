@@ -2,9 +2,12 @@ import pathlib
 import pandas as pd
 import logging
 import re
-from typing import List, Tuple, Dict, Union, Any
+import functools
+from typing import List, Tuple, Dict, Union, Any, Iterable
 from sampytools.list_utils import construct_dict_from_list_of_key_values, reverse_list, \
     add_new_values_in_certain_item_location
+from sampytools.text_pattern_utils import normalize_text_to_words_joined_with_char, SWITCH_VALUE_PATTERN
+from concurrent.futures import ProcessPoolExecutor
 from enum import IntEnum
 
 
@@ -127,6 +130,78 @@ def group_count_sort_series(df, group_cols, count_column, ascending=False):
     return df.groupby(group_cols)[count_column].count().sort_values(ascending=ascending)
 
 
+def group_count_series(df: pd.DataFrame, group_cols: Union[str, List[str]], count_column: str) -> pd.Series:
+    """
+    Count non-null values of count_column per group with hash counting (value_counts) and without sorting
+    Returns the same counts as df.groupby(group_cols)[count_column].count()
+    :param df: dataframe
+    :param group_cols: column or list of columns to group by
+    :param count_column: column whose non-null values are counted
+    :return: counts series indexed by groups
+    """
+    if isinstance(group_cols, str):
+        group_cols = [group_cols]
+    mask = df[count_column].notna()
+    if len(group_cols) == 1:
+        counts = df.loc[mask, group_cols[0]].value_counts(sort=False)
+    else:
+        counts = df.loc[mask, group_cols].value_counts(sort=False)
+    counts.name = count_column
+    return counts
+
+
+def select_top_k_counts(counts: pd.Series, top_k: int = 20, ascending: bool = False) -> pd.Series:
+    """
+    Select top k counts with partial selection instead of sorting all of them
+    :param counts: counts series
+    :param top_k: number of groups to keep
+    :param ascending: if True return the k smallest counts instead
+    :return: top k counts in sorted order
+    """
+    if ascending:
+        return counts.nsmallest(top_k)
+    return counts.nlargest(top_k)
+
+
+def group_count_top_k_series(df: pd.DataFrame, group_cols: Union[str, List[str]], count_column: str,
+                             top_k: int = 20, ascending: bool = False) -> pd.Series:
+    """
+    Group by specified columns and return only top k counts in descending order
+    Faster version of group_count_sort_series when we only look at the largest groups
+    :param df: dataframe
+    :param group_cols: column or list of columns to group by
+    :param count_column: column whose non-null values are counted
+    :param top_k: number of groups to keep
+    :param ascending: if True return the k smallest counts instead
+    :return: top k counts series
+    """
+    return select_top_k_counts(group_count_series(df, group_cols, count_column), top_k, ascending)
+
+
+def group_count_top_k_series_from_chunks(chunks: Iterable[pd.DataFrame], group_cols: Union[str, List[str]],
+                                         count_column: str, top_k: int = 20, ascending: bool = False) -> pd.Series:
+    """
+    Group count over dataframe chunks, such as pd.read_csv(..., chunksize=...) reader, merging partial counts of each chunk
+    Only the counts per distinct group are kept in memory, never the chunks themselves
+    :param chunks: iterable of dataframes
+    :param group_cols: column or list of columns to group by
+    :param count_column: column whose non-null values are counted
+    :param top_k: number of groups to keep, None to return all merged counts
+    :param ascending: if True return the k smallest counts instead
+    :return: top k counts series
+    """
+    total_counts = None
+    for chunk in chunks:
+        counts = group_count_series(chunk, group_cols, count_column)
+        total_counts = counts if total_counts is None else total_counts.add(counts, fill_value=0)
+    if total_counts is None:
+        return pd.Series(dtype="int64", name=count_column)
+    total_counts = total_counts.astype("int64")
+    if top_k is None:
+        return total_counts.sort_values(ascending=ascending)
+    return select_top_k_counts(total_counts, top_k, ascending)
+
+
 def order_merged_dataframe_cols(
         mrg_df: pd.DataFrame,
         index_cols: List[str],
@@ -169,38 +244,54 @@ def compare_dataframes(
     return mrg_df
 
 
-def pandas_multi_index_to_columns(agg_df: pd.DataFrame):
+def get_index_levels_as_columns(index: pd.Index, as_categorical: bool = False) -> Dict[str, Any]:
+    """
+    Get each level of an index as column values keyed by level name, the same names reset_index would use
+    With as_categorical multi index levels are built from level codes and categories, so level values are not materialized
+    :param index: index or multi index
+    :param as_categorical: whether to return levels of multi index as categoricals
+    :return: dictionary that maps level name to its values
+    """
+    if not isinstance(index, pd.MultiIndex):
+        return {index.name if index.name is not None else "index": index.to_numpy()}
+    level_names = [name if name is not None else f"level_{i}" for i, name in enumerate(index.names)]
+    if as_categorical:
+        return {
+            name: pd.Categorical.from_codes(codes, categories=level)
+            for name, level, codes in zip(level_names, index.levels, index.codes)
+        }
+    return {name: index.get_level_values(i) for i, name in enumerate(level_names)}
+
+
+def pandas_multi_index_to_columns(agg_df: pd.DataFrame, as_categorical: bool = False):
     """
     Move multi-index to columns
     :param agg_df:
+    :param as_categorical: whether to move multi index levels as categoricals built from level codes
     :return: dataframe whose multi index values are moved to individual columns
     """
-    index_names = list(agg_df.index.names)
-    existing_cols = list(agg_df.columns)
-    for col in index_names:
-        agg_df[col] = agg_df.index.get_level_values(col)
-    agg_df = agg_df[index_names + existing_cols]
-    agg_df.index = range(len(agg_df))
-    return agg_df
+    if not as_categorical:
+        return agg_df.reset_index()
+    level_df = pd.DataFrame(get_index_levels_as_columns(agg_df.index, as_categorical=True),
+                            index=pd.RangeIndex(len(agg_df)))
+    return pd.concat([level_df, agg_df.reset_index(drop=True)], axis=1)
 
 
 def pandas_series_multi_index_to_columns(
-        agg_series: pd.Series, series_col_name: str = "count"
+        agg_series: pd.Series, series_col_name: str = "count", as_categorical: bool = False
 ) -> pd.DataFrame:
     """
     Multi index series to dataframe with columns representing each level of multi level index
     :param agg_series: series with multi level index
     :param series_col_name: series column name
+    :param as_categorical: whether to move multi index levels as categoricals built from level codes
     :return: dataframe with columns representing levels of multi level index
     """
-    index_names = list(agg_series.index.names)
-    df = pd.DataFrame({series_col_name: agg_series.values})
-    cols = index_names + [series_col_name]
-    for col in index_names:
-        df[col] = agg_series.index.get_level_values(col)
-    df = df[cols]
-    df.index = range(len(df))
-    return df
+    if not as_categorical:
+        return agg_series.reset_index(name=series_col_name)
+    cols = get_index_levels_as_columns(agg_series.index, as_categorical=True)
+    cols[series_col_name] = agg_series.to_numpy()
+    return pd.DataFrame(cols, index=pd.RangeIndex(len(agg_series)))
 
 
 def wrap_code_in_wiki_macro(code_text):
@@ -213,33 +304,57 @@ def wrap_code_in_wiki_macro(code_text):
           </div>"""
 
 
-def convert_dataframe_to_wiki_table(
-        df, code_col="empty", good_table_class_name="some_code", col_styles=None
-):
+@functools.lru_cache(maxsize=128)
+def compile_wiki_table_templates(
+        cols: Tuple[str, ...], col_widths: Tuple[int, ...], good_table_class_name: str = "some_code"
+) -> Tuple[str, str]:
     """
-    Convert dataframe into good wiki table
-    :param df:
-    :param code_col:
+    Compile wiki table header and row template for a column schema once, so that tables with the same columns reuse them
+    :param cols: column names
+    :param col_widths: width in pixels of each column, in the same order as cols
     :param good_table_class_name:
-    :param col_styles:
-    :return:
+    :return: header and row template that takes one positional argument per column
     """
-    cols = df.columns.tolist()
-    if not col_styles:
-        col_styles = {col: 200 if col != code_col else 1000 for col in cols}
+    col_group = "".join(['<col style="width:' + str(width) + 'px;"/>' for width in col_widths])
     header = f"""<div class="{good_table_class_name}">
               <p>
                 <br/>
               </p>
               <table class="wrapped">
-                <colgroup>{"".join(['<col style="width:' + str(col_styles[col]) + 'px;"/>' for col in col_styles])}                  
+                <colgroup>{col_group}                  
                 </colgroup>
                 <thead>
                   <tr>{" ".join([f'<th>{col}</th>' for col in cols])}                    
                   </tr>
                 </thead>
             """
-    body = f"""<tbody>{"".join(["<tr>" + "".join([f"<td>{row[col] if col != code_col else wrap_code_in_wiki_macro(row[col])}</td>" for col in cols]) + "</tr>" for i, row in df.iterrows()])}</tbody></table></div>"""
+    row_template = "<tr>" + "<td>{}</td>" * len(cols) + "</tr>"
+    return header, row_template
+
+
+def convert_dataframe_to_wiki_table(
+        df, code_col="empty", good_table_class_name="some_code", col_styles=None
+):
+    """
+    Convert dataframe into good wiki table
+    Header and row templates are cached per column schema, see compile_wiki_table_templates
+    :param df:
+    :param code_col:
+    :param good_table_class_name:
+    :param col_styles: column widths in pixels, columns that are not specified get the default width
+    :return:
+    """
+    cols = df.columns.tolist()
+    if not col_styles:
+        col_styles = {}
+    col_widths = tuple(col_styles.get(col, 200 if col != code_col else 1000) for col in cols)
+    header, row_template = compile_wiki_table_templates(tuple(cols), col_widths, good_table_class_name)
+    col_values = [
+        df[col].map(wrap_code_in_wiki_macro) if col == code_col else df[col]
+        for col in cols
+    ]
+    rows = "".join([row_template.format(*row) for row in zip(*col_values)])
+    body = f"""<tbody>{rows}</tbody></table></div>"""
     return header + body
 
 
@@ -273,12 +388,34 @@ def convert_columns_to_lowercase_and_nowhitespace(
     :param join_char:
     :return:
     """
-    df.columns = df.columns.map(
-        lambda col: f"{join_char}".join(re.findall(r"\w+", col)).lower()
+    df.columns = normalize_index_to_words_joined_with_char(
+        df.columns, join_char=join_char, lowercase=True
     )
     return df
 
 
+def normalize_index_to_words_joined_with_char(
+        index: pd.Index, join_char: str = "_", lowercase: bool = False
+) -> pd.Index:
+    """
+    Normalize a whole index at once by extracting words from each value and joining them with specified character
+    Only distinct values go through the cached normalizer, the result is then expanded back with index codes
+    Missing values (NaN, None) raise TypeError like the per-value normalizer does
+    :param index: index of string values, most often dataframe columns
+    :param join_char:
+    :param lowercase: whether to lowercase normalized values
+    :return: index with normalized values
+    """
+    codes, uniques = pd.factorize(index)
+    if (codes == -1).any():
+        raise TypeError(f"cannot normalize missing values in index, found at positions {np.flatnonzero(codes == -1).tolist()}")
+    normalized_uniques = np.array(
+        [normalize_text_to_words_joined_with_char(val, join_char, lowercase) for val in uniques],
+        dtype=object,
+    )
+    return pd.Index(normalized_uniques.take(codes), name=index.name)
+
+
 def sort_columns_of_merged_dataframe(mrg_df, key_cols, cols, suffixes):
     """
     Sort columns of a merged dataframe so that we can compare column values from original dataframes easily
@@ -344,10 +481,7 @@ def clean_up_multi_index_cols(mi_cols: List[Tuple[str, ...]]) -> List[Tuple[str,
     :param mi_cols:
     :return:
     """
-    cleaned_mi_cols = []
-    for mi_col in mi_cols:
-        cleaned_mi_cols.append(tuple([token for token in mi_col if token != ""]))
-    return cleaned_mi_cols
+    return [tuple(token for token in mi_col if token != "") for mi_col in mi_cols]
 
 
 def convert_multi_index_col_to_one_dim_col(
@@ -359,9 +493,8 @@ def convert_multi_index_col_to_one_dim_col(
     :param join_char:
     :return:
     """
-    mi_cols = df.columns
-    mi_cols = clean_up_multi_index_cols(list(mi_cols))
-    df.columns = [f"{join_char}".join(mi_col) for mi_col in mi_cols]
+    mi_cols = clean_up_multi_index_cols(df.columns)
+    df.columns = [join_char.join(mi_col) for mi_col in mi_cols]
     return df
 
 
@@ -526,6 +659,57 @@ def list_of_dict_to_dataframe(
     return pd.DataFrame([record_dict])
 
 
+def list_of_dict_to_dataframe_by_entity(
+        records: Union[List[Dict[Any, Any]], pd.DataFrame],
+        entity_col_name: str,
+        key_col_name: str = None,
+        value_col_name: str = None,
+) -> pd.DataFrame:
+    """
+    Batch version of list_of_dict_to_dataframe that returns one row per entity and one column per key
+    A single dictionary has structure {entity_col_name:entity_val,key_col_name:key_col_val,value_col_name:value_col_val}
+    Records are pivoted in one vectorized assignment, entities and keys keep their order of first appearance,
+    the last value wins for repeated (entity, key) pairs and missing pairs get NaN (NA for integer values,
+    which are kept in nullable integer columns). Missing entities or keys (None, NaN) are kept as their own row or column
+    :param records: list of dictionaries or dataframe with entity, key and value columns
+    :param entity_col_name:
+    :param key_col_name: by default the first column other than entity column
+    :param value_col_name: by default the second column other than entity column
+    :return: dataframe indexed by entity with one column per key
+    """
+    records_df = records if isinstance(records, pd.DataFrame) else pd.DataFrame.from_records(records)
+    if key_col_name is None or value_col_name is None:
+        other_cols = [col for col in records_df.columns if col != entity_col_name]
+        if len(other_cols) != 2:
+            raise ValueError(f"expected key and value columns besides {entity_col_name}, got {other_cols}")
+        key_col_name, value_col_name = other_cols
+    entity_codes, entities = pd.factorize(records_df[entity_col_name], use_na_sentinel=False)
+    key_codes, keys = pd.factorize(records_df[key_col_name], use_na_sentinel=False)
+    values = records_df[value_col_name].to_numpy()
+    # numpy does not define which of repeated indices an assignment writes last, so repeated pairs are dropped first
+    last_of_pair = ~pd.Index(entity_codes * len(keys) + key_codes).duplicated(keep="last")
+    if not last_of_pair.all():
+        entity_codes, key_codes, values = entity_codes[last_of_pair], key_codes[last_of_pair], values[last_of_pair]
+    shape = (len(entities), len(keys))
+    index = pd.Index(entities, name=entity_col_name)
+    if values.dtype.kind in "iu":
+        wide = np.zeros(shape, dtype=values.dtype)
+        wide[entity_codes, key_codes] = values
+        filled = np.zeros(shape, dtype=bool)
+        filled[entity_codes, key_codes] = True
+        wide_df = pd.DataFrame(wide, index=index, columns=keys)
+        if filled.all():
+            return wide_df
+        # nullable integer columns keep exact values, a float round-trip would lose precision above 2**53
+        return wide_df.astype(pd.array(values[:0]).dtype).mask(~filled)
+    if values.dtype.kind == "f":
+        wide = np.full(shape, np.nan)
+    else:
+        wide = np.full(shape, np.nan, dtype=object)
+    wide[entity_codes, key_codes] = values
+    return pd.DataFrame(wide, index=index, columns=keys)
+
+
 def print_df_header(df: pd.DataFrame, no_of_head_rows: int = 5, cols: List[str] = None):
     """
     Print dataframe header
@@ -635,4 +819,45 @@ def read_csv_file_with_multiple_encodings(filepath: pathlib.Path, **kwargs) -> p
         0,
         1,
         f"Could not read {filepath} with any of the tried encodings: {encodings_to_try}",
-    )
\ No newline at end of file
+    )
+
+
+def _extract_switches_values_from_series(command_lines: pd.Series) -> pd.DataFrame:
+    """
+    Extract switches and their values of command lines into one column per switch
+    :param command_lines: series of command lines with RangeIndex
+    :return: dataframe with the same index as command_lines
+    """
+    matches = command_lines.str.extractall(SWITCH_VALUE_PATTERN)
+    matches.columns = ["switch", "value"]
+    matches["row"] = matches.index.get_level_values(0)
+    # the same switch repeated in one command line keeps its last value, like dict(findall) does
+    matches = matches.drop_duplicates(["row", "switch"], keep="last")
+    switches_df = matches.pivot(index="row", columns="switch", values="value")
+    switches_df.columns.name = None
+    return switches_df.reindex(command_lines.index)
+
+
+def extract_switches_values_to_dataframe(
+        command_lines: Union[pd.Series, Iterable[str]], n_jobs: int = None, chunk_size: int = 100_000
+) -> pd.DataFrame:
+    """
+    Batch version of text_utils.extract_switches_values that returns one column per switch and one row per command line
+    Command lines without a switch get NaN
+    :param command_lines: series or iterable of command lines
+    :param n_jobs: number of processes to extract with, by default extract in current process
+    :param chunk_size: number of command lines per process task
+    :return: dataframe with the same index as command_lines
+    """
+    if not isinstance(command_lines, pd.Series):
+        command_lines = pd.Series(list(command_lines), dtype=object)
+    orig_index = command_lines.index
+    command_lines = command_lines.reset_index(drop=True)
+    if n_jobs is None or n_jobs == 1 or len(command_lines) <= chunk_size:
+        switches_df = _extract_switches_values_from_series(command_lines)
+    else:
+        chunks = [command_lines.iloc[i: i + chunk_size] for i in range(0, len(command_lines), chunk_size)]
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            switches_df = pd.concat(list(executor.map(_extract_switches_values_from_series, chunks)))
+    switches_df.index = orig_index
+    return switches_df
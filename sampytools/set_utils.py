@@ -0,0 +1,121 @@
+from collections import Counter
+from typing import Any, List, Union
+
+import numpy as np
+
+from sampytools.list_utils import get_list_diff, get_intersection, get_unique_records_from_list
+
+SequenceType = Union[List[Any], np.ndarray]
+
+# integers and fixed-width strings can be compared with numpy sorting based set routines
+NUMPY_FAST_PATH_KINDS = "iuUS"
+
+
+def _is_numpy_fast_path(*arrays: SequenceType) -> bool:
+    """
+    Whether all arguments are numpy arrays of integers or fixed-width strings
+    """
+    return all(isinstance(arr, np.ndarray) and arr.dtype.kind in NUMPY_FAST_PATH_KINDS for arr in arrays)
+
+
+def _unique_in_order(arr: np.ndarray) -> np.ndarray:
+    """
+    Unique values of numpy array in first-seen order
+    """
+    _, first_idx = np.unique(arr, return_index=True)
+    return arr[np.sort(first_idx)]
+
+
+def ordered_diff(list1: SequenceType, list2: SequenceType) -> SequenceType:
+    """
+    Unique elements of list1 that are not in list2, in the order they appear in list1
+    Numpy arrays of integers or fixed-width strings are compared with np.isin and a numpy array is returned
+    :param list1:
+    :param list2:
+    :return:
+    """
+    if _is_numpy_fast_path(list1, list2):
+        return _unique_in_order(list1[~np.isin(list1, list2)])
+    return get_list_diff(list1, list2)
+
+
+def ordered_intersection(list1: SequenceType, list2: SequenceType) -> SequenceType:
+    """
+    Unique elements of list1 that are also in list2, in the order they appear in list1
+    :param list1:
+    :param list2:
+    :return:
+    """
+    if _is_numpy_fast_path(list1, list2):
+        return _unique_in_order(list1[np.isin(list1, list2)])
+    return get_intersection(list1, list2)
+
+
+def ordered_union(list1: SequenceType, list2: SequenceType) -> SequenceType:
+    """
+    Unique elements of list1 followed by unique elements of list2 that are not in list1
+    :param list1:
+    :param list2:
+    :return:
+    """
+    if _is_numpy_fast_path(list1, list2):
+        return _unique_in_order(np.concatenate([list1, list2]))
+    return get_unique_records_from_list([*list1, *list2])
+
+
+def ordered_symmetric_difference(list1: SequenceType, list2: SequenceType) -> SequenceType:
+    """
+    Unique elements of list1 that are not in list2 followed by unique elements of list2 that are not in list1
+    :param list1:
+    :param list2:
+    :return:
+    """
+    if _is_numpy_fast_path(list1, list2):
+        return np.concatenate([ordered_diff(list1, list2), ordered_diff(list2, list1)])
+    return ordered_diff(list1, list2) + ordered_diff(list2, list1)
+
+
+def multiset_diff(list1: List[Any], list2: List[Any]) -> List[Any]:
+    """
+    Elements of list1 with duplicates, where each occurrence in list2 cancels one occurrence in list1
+    For instance multiset_diff([1, 1, 2, 3], [1, 3]) is [1, 2]
+    :param list1:
+    :param list2:
+    :return: remaining elements of list1 in their original order
+    """
+    remaining = Counter(list2)
+    result = []
+    for item in list1:
+        if remaining[item] > 0:
+            remaining[item] -= 1
+        else:
+            result.append(item)
+    return result
+
+
+def multiset_intersection(list1: List[Any], list2: List[Any]) -> List[Any]:
+    """
+    Elements of list1 with duplicates, keeping each element as many times as it appears in both lists
+    For instance multiset_intersection([1, 1, 2, 3], [1, 3, 3]) is [1, 3]
+    :param list1:
+    :param list2:
+    :return: common elements in the order they appear in list1
+    """
+    remaining = Counter(list2)
+    result = []
+    for item in list1:
+        if remaining[item] > 0:
+            remaining[item] -= 1
+            result.append(item)
+    return result
+
+
+def multiset_union(list1: List[Any], list2: List[Any]) -> List[Any]:
+    """
+    Elements of list1 followed by occurrences of list2 elements beyond their count in list1
+    For instance multiset_union([1, 1, 2], [1, 3, 3]) is [1, 1, 2, 3, 3]
+    :param list1:
+    :param list2:
+    :return:
+    """
+    return list1 + multiset_diff(list2, list1)
@@ -0,0 +1,370 @@
+import math
+import pathlib
+import logging
+import itertools
+from typing import Any, Iterable, List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+HASH_BITS = 64
+HLL_MIN_PRECISION = 4
+HLL_MAX_PRECISION = 18
+
+
+def hash_values(values: Union[pd.Series, pd.DataFrame, pd.Index, List[Any]]) -> np.ndarray:
+    """
+    Hash values into 64 bit unsigned integers with pandas vectorized hashing
+    Rows of a dataframe are hashed as one combined key, so multi column group keys get one hash per row
+    Keys are hashed by value, so the same key should be passed with the same dtypes to get the same hash
+    :param values: series, dataframe, index or list of values
+    :return: numpy array of uint64 hashes
+    """
+    if isinstance(values, pd.MultiIndex):
+        values = values.to_frame(index=False)
+    elif isinstance(values, pd.Index):
+        values = values.to_series(index=None)
+    elif not isinstance(values, (pd.Series, pd.DataFrame)):
+        values = pd.Series(values, dtype=object)
+    return pd.util.hash_pandas_object(values, index=False).to_numpy(dtype=np.uint64)
+
+
+class HyperLogLog:
+    """
+    HyperLogLog sketch to estimate number of distinct values in bounded memory
+    Relative standard error of the estimate is about 1.04 / sqrt(2 ** precision), precision is between 4 and 18
+    so the smallest reachable error is about 0.002 (256 KiB of registers), targets above 0.26 still use 16 registers
+    """
+
+    def __init__(self, relative_error: float = 0.01) -> None:
+        """
+        constructor.
+
+        :param relative_error: Target relative standard error, used to pick number of registers,
+            at least 1.04 / sqrt(2 ** 18) (about 0.00203)
+        :raises ValueError: if relative_error is below what the largest precision reaches
+        """
+        min_relative_error = 1.04 / math.sqrt(2 ** HLL_MAX_PRECISION)
+        if not relative_error >= min_relative_error:
+            raise ValueError(
+                f"relative_error must be at least {min_relative_error:.5f} "
+                f"(precision {HLL_MAX_PRECISION}), got {relative_error}"
+            )
+        precision = math.ceil(math.log2((1.04 / relative_error) ** 2))
+        self.precision = max(precision, HLL_MIN_PRECISION)
+        self.registers = np.zeros(2 ** self.precision, dtype=np.uint8)
+
+    @property
+    def relative_error(self) -> float:
+        """
+        Relative standard error of the estimate with current number of registers
+
+        :return: Relative standard error
+        """
+        return 1.04 / math.sqrt(len(self.registers))
+
+    def update_hashes(self, hashes: np.ndarray) -> None:
+        """
+        Add 64 bit hashes of values to the sketch
+
+        :param hashes: numpy array of uint64 hashes
+        """
+        if len(hashes) == 0:
+            return
+        rest_bits = HASH_BITS - self.precision
+        register_idx = (hashes >> np.uint64(rest_bits)).astype(np.int64)
+        rest = hashes & np.uint64((1 << rest_bits) - 1)
+        # position of the leftmost 1-bit within the remaining bits, rest == 0 gets rest_bits + 1
+        _, bit_length = np.frexp(rest.astype(np.float64))
+        rho = (rest_bits - np.minimum(bit_length, rest_bits) + 1).astype(np.uint8)
+        np.maximum.at(self.registers, register_idx, rho)
+
+    def update(self, values: Union[pd.Series, pd.DataFrame, pd.Index, List[Any]]) -> None:
+        """
+        Add values to the sketch
+
+        :param values: series, dataframe rows, index or list of values
+        """
+        self.update_hashes(hash_values(values))
+
+    def merge(self, other: "HyperLogLog") -> None:
+        """
+        Merge another sketch with the same precision into this one
+
+        :param other: Another HyperLogLog
+        """
+        if other.precision != self.precision:
+            raise ValueError("can only merge HyperLogLog sketches with the same precision")
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def count(self) -> int:
+        """
+        Estimated number of distinct values added to the sketch
+
+        :return: Estimated distinct count
+        """
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zero_registers = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zero_registers:
+            estimate = m * math.log(m / zero_registers)
+        return int(round(estimate))
+
+
+class CountMinSketch:
+    """
+    Count-Min sketch to estimate counts of values in bounded memory
+    Estimates never undercount and overcount by at most epsilon * total count with probability 1 - delta
+    """
+
+    def __init__(self, epsilon: float = 0.001, delta: float = 0.01) -> None:
+        """
+        constructor.
+
+        :param epsilon: Overcount bound relative to total count
+        :param delta: Probability that the overcount bound does not hold
+        """
+        self.epsilon = epsilon
+        self.delta = delta
+        self.width = math.ceil(math.e / epsilon)
+        self.depth = math.ceil(math.log(1 / delta))
+        self.table = np.zeros((self.depth, self.width), dtype=np.int64)
+        self.total = 0
+
+    def _column_indices(self, hashes: np.ndarray) -> np.ndarray:
+        """
+        Column index of each hash for each row of the table, derived from one 64 bit hash by double hashing
+
+        :param hashes: numpy array of uint64 hashes
+        :return: array of shape (depth, len(hashes))
+        """
+        low = hashes & np.uint64(0xFFFFFFFF)
+        high = hashes >> np.uint64(32)
+        rows = np.arange(self.depth, dtype=np.uint64)[:, None]
+        return ((low + rows * high) % np.uint64(self.width)).astype(np.int64)
+
+    def update_hashes(self, hashes: np.ndarray, counts: np.ndarray = None) -> None:
+        """
+        Add 64 bit hashes of values to the sketch
+
+        :param hashes: numpy array of uint64 hashes
+        :param counts: Optional count of each hash, by default every hash counts once
+        """
+        if counts is None:
+            counts = np.ones(len(hashes), dtype=np.int64)
+        counts = np.asarray(counts, dtype=np.int64)
+        for row, col_idx in enumerate(self._column_indices(hashes)):
+            np.add.at(self.table[row], col_idx, counts)
+        self.total += int(counts.sum())
+
+    def update_counts(self, counts: pd.Series) -> None:
+        """
+        Add already counted values, such as result of value_counts, to the sketch
+
+        :param counts: series that maps values to their counts
+        """
+        self.update_hashes(hash_values(counts.index), counts.to_numpy())
+
+    def merge(self, other: "CountMinSketch") -> None:
+        """
+        Merge another sketch with the same dimensions into this one
+
+        :param other: Another CountMinSketch
+        """
+        if self.table.shape != other.table.shape:
+            raise ValueError("can only merge CountMinSketch sketches with the same width and depth")
+        self.table += other.table
+        self.total += other.total
+
+    def estimate_hashes(self, hashes: np.ndarray) -> np.ndarray:
+        """
+        Estimated counts of hashed values
+
+        :param hashes: numpy array of uint64 hashes
+        :return: numpy array of estimated counts
+        """
+        col_idx = self._column_indices(hashes)
+        return self.table[np.arange(self.depth)[:, None], col_idx].min(axis=0)
+
+    def estimate(self, values: Union[pd.Series, pd.DataFrame, pd.Index, List[Any]]) -> np.ndarray:
+        """
+        Estimated counts of values
+
+        :param values: values hashed the same way as they were added
+        :return: numpy array of estimated counts
+        """
+        return self.estimate_hashes(hash_values(values))
+
+
+class SpaceSaving:
+    """
+    Space-Saving summary that keeps at most capacity counters to find the most frequent values
+    Any value whose count is above total / capacity is guaranteed to be kept, its count is overestimated by at most error
+    """
+
+    def __init__(self, capacity: int = 1000) -> None:
+        """
+        constructor.
+
+        :param capacity: Maximum number of counters to keep
+        """
+        self.capacity = capacity
+        self.counters = pd.Series(dtype="int64")
+        self.errors = pd.Series(dtype="int64")
+
+    def update_counts(self, counts: pd.Series) -> None:
+        """
+        Add already counted values, such as result of value_counts of one chunk
+        New values start from the smallest kept counter, so counts are never underestimated
+
+        :param counts: series that maps values to their counts
+        """
+        if len(counts) == 0:
+            return
+        floor = int(self.counters.min()) if len(self.counters) >= self.capacity else 0
+        counts = counts.astype("int64")
+        counts.index = pd.Index(counts.index.tolist(), tupleize_cols=False)
+        is_new = ~counts.index.isin(self.counters.index)
+        new_counts = counts[is_new] + floor
+        counters = pd.concat([self.counters.add(counts[~is_new], fill_value=0).astype("int64"), new_counts])
+        errors = pd.concat([self.errors, pd.Series(floor, index=new_counts.index, dtype="int64")])
+        if len(counters) > self.capacity:
+            counters = counters.nlargest(self.capacity)
+        self.counters = counters
+        self.errors = errors[counters.index]
+
+    def update(self, values: Union[pd.Series, List[Any]]) -> None:
+        """
+        Add values to the summary
+
+        :param values: series or list of values
+        """
+        self.update_counts(pd.Series(values).value_counts(sort=False))
+
+    def top_k(self, k: int = 20) -> List[Tuple[Any, int, int]]:
+        """
+        Most frequent values
+
+        :param k: Number of values to return
+        :return: list of (value, estimated count, maximum overestimation) sorted by estimated count
+        """
+        top_counters = self.counters.nlargest(k)
+        return [(key, int(count), int(self.errors[key])) for key, count in top_counters.items()]
+
+
+class StreamingGroupProfile:
+    """
+    Approximate profile of group keys over a stream of dataframe chunks
+    Keeps distinct group count (HyperLogLog), per group counts (Count-Min) and heavy hitters (Space-Saving) in bounded memory
+    """
+
+    def __init__(self, group_cols: Union[str, List[str]], relative_error: float = 0.01, epsilon: float = 0.001,
+                 delta: float = 0.01, top_k_capacity: int = 1000) -> None:
+        """
+        constructor.
+
+        :param group_cols: Column or list of columns that make up group key
+        :param relative_error: Relative standard error of distinct group count
+        :param epsilon: Overcount bound of group counts relative to number of rows
+        :param delta: Probability that the overcount bound does not hold
+        :param top_k_capacity: Number of heavy hitter counters to keep
+        """
+        self.group_cols = [group_cols] if isinstance(group_cols, str) else list(group_cols)
+        self.distinct_groups = HyperLogLog(relative_error)
+        self.group_counts = CountMinSketch(epsilon, delta)
+        self.heavy_hitters = SpaceSaving(top_k_capacity)
+        self.row_count = 0
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        """
+        Add one dataframe chunk to the profile
+
+        :param chunk: dataframe that has group columns
+        """
+        keys = chunk[self.group_cols[0]] if len(self.group_cols) == 1 else chunk[self.group_cols]
+        counts = keys.value_counts(sort=False)
+        self.distinct_groups.update_hashes(hash_values(counts.index))
+        self.group_counts.update_counts(counts)
+        self.heavy_hitters.update_counts(counts)
+        self.row_count += len(chunk)
+
+    def update_from_chunks(self, chunks: Iterable[pd.DataFrame]) -> "StreamingGroupProfile":
+        """
+        Add all chunks, such as pd.read_csv(..., chunksize=...) reader, to the profile
+
+        :param chunks: iterable of dataframes
+        :return: the profile itself
+        """
+        for chunk in chunks:
+            self.update(chunk)
+        return self
+
+    def distinct_count(self) -> int:
+        """
+        Estimated number of distinct groups
+
+        :return: Estimated distinct group count
+        """
+        return self.distinct_groups.count()
+
+    def top_k(self, k: int = 20) -> pd.Series:
+        """
+        Most frequent groups in the same shape as group_count_sort_series result
+
+        :param k: Number of groups to return
+        :return: series of estimated counts indexed by group key
+        """
+        top_items = self.heavy_hitters.top_k(k)
+        keys = [key for key, _, _ in top_items]
+        if len(self.group_cols) == 1:
+            index = pd.Index(keys, name=self.group_cols[0])
+        else:
+            index = pd.MultiIndex.from_tuples(keys, names=self.group_cols)
+        return pd.Series([count for _, count, _ in top_items], index=index, dtype="int64", name="count")
+
+
+def profile_group_counts_in_csv_file(filepath: pathlib.Path, group_cols: Union[str, List[str]],
+                                     chunksize: int = 1_000_000, relative_error: float = 0.01,
+                                     epsilon: float = 0.001, delta: float = 0.01, top_k_capacity: int = 1000,
+                                     **kwargs) -> StreamingGroupProfile:
+    """
+    Profile group keys of a CSV file by reading it in chunks
+    :param filepath: Path to the CSV file
+    :param group_cols: Column or list of columns that make up group key
+    :param chunksize: number of rows per chunk
+    :param relative_error: Relative standard error of distinct group count
+    :param epsilon: Overcount bound of group counts relative to number of rows
+    :param delta: Probability that the overcount bound does not hold
+    :param top_k_capacity: Number of heavy hitter counters to keep
+    :param kwargs: Additional arguments to pass to pd.read_csv
+    :return: profile of group keys
+    """
+    usecols = [group_cols] if isinstance(group_cols, str) else list(group_cols)
+    kwargs.setdefault("usecols", usecols)
+    profile = StreamingGroupProfile(group_cols, relative_error, epsilon, delta, top_k_capacity)
+    with pd.read_csv(filepath, chunksize=chunksize, **kwargs) as reader:
+        profile.update_from_chunks(reader)
+    logging.info(
+        f"{filepath} has {profile.row_count} rows and approximately {profile.distinct_count()} distinct {usecols} groups")
+    return profile
+
+
+def approximate_distinct_count(values: Iterable[Any], relative_error: float = 0.01,
+                               batch_size: int = 100_000) -> int:
+    """
+    Estimate number of distinct values of an iterable without holding all of them in memory
+    For instance distinct keys of a list of dictionaries: approximate_distinct_count(itertools.chain.from_iterable(dicts))
+    :param values: iterable of hashable values
+    :param relative_error: Relative standard error of the estimate
+    :param batch_size: number of values hashed at once
+    :return: Estimated distinct count
+    """
+    hll = HyperLogLog(relative_error)
+    iterator = iter(values)
+    while True:
+        batch = list(itertools.islice(iterator, batch_size))
+        if not batch:
+            break
+        hll.update(batch)
+    return hll.count()
@@ -0,0 +1,23 @@
+import re
+import functools
+
+WORD_PATTERN = re.compile(r"\w+")
+NORMALIZED_TEXT_CACHE_SIZE = 4096
+SWITCH_VALUE_PATTERN = re.compile(r"(-[a-zA-Z]+)\s+(\S+)")
+
+
+@functools.lru_cache(maxsize=NORMALIZED_TEXT_CACHE_SIZE)
+def normalize_text_to_words_joined_with_char(
+    text: str, join_char: str = "_", lowercase: bool = False
+) -> str:
+    """
+    Extract words from text, join them with specified character and optionally lowercase the result.
+    Results are kept in a bounded LRU cache, because we keep normalizing the same few hundred column headers.
+    Use normalize_text_to_words_joined_with_char.cache_info() to see hits/misses and cache_clear() to reset it
+    :param text:
+    :param join_char:
+    :param lowercase: whether to lowercase the joined text
+    :return:
+    """
+    joined_text = join_char.join(WORD_PATTERN.findall(text))
+    return joined_text.lower() if lowercase else joined_text
@@ -1,11 +1,26 @@
 import pathlib
 import re
 import logging
-from typing import List
+import codecs
+import functools
+import io
+import gzip
+import csv
+import mmap
+import itertools
+import heapq
+import tempfile
+import time
+from contextlib import ExitStack
+from typing import List, Dict, Tuple, Any, Iterable
 from collections import Counter
+import numpy as np
+import joblib
+from scipy.sparse import csr_matrix, vstack
 from sampytools.configdict import ConfigDict
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.decomposition import NMF
+from sklearn.feature_extraction.text import TfidfVectorizer, HashingVectorizer
+from sklearn.decomposition import NMF, MiniBatchNMF
+from sklearn.neighbors import NearestNeighbors
 from sklearn.preprocessing import normalize
 import logging
 
@@ -15,15 +30,36 @@ from sampytools.list_utils import (
     get_intersection,
 )
 
+from sampytools.text_pattern_utils import (
+    WORD_PATTERN,
+    NORMALIZED_TEXT_CACHE_SIZE,
+    SWITCH_VALUE_PATTERN,
+    normalize_text_to_words_joined_with_char,
+)
+
+COMPRESSION_BY_SUFFIX = {".gz": "gzip", ".zst": "zstd"}
+# string literals, quoted identifiers, line comments and block comments
+SQL_SKIP_PATTERN = r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|--[^\n]*|/\*.*?\*/"
+
 
 def split_text_by_certain_substring_and_save(
-    long_text, split_str, filepath: pathlib.Path
+    long_text, split_str, filepath: pathlib.Path, print_lines: bool = False, compression: str = None
 ):
+    """
+    Split text by substring and save the parts separated by blank lines
+    :param long_text:
+    :param split_str:
+    :param filepath:
+    :param print_lines: whether to print every part to stdout
+    :param compression: None, gzip, zstd or infer from file suffix
+    :return: parts of the text
+    """
     lines = long_text.split(split_str)
-    filepath.write_text("\n\n".join(lines))
-    for line in lines:
-        print(line)
-        print("\n\n")
+    write_lines_to_file(filepath, lines, separator="\n\n", compression=compression)
+    if print_lines:
+        for line in lines:
+            print(line)
+            print("\n\n")
     return lines
 
 
@@ -50,14 +86,183 @@ def generate_tab_delimited_line_from_list(alist: List[str]):
     return join_list_to_line(alist, "\t")
 
 
-def format_sql_query(sql_keywords, query):
-    for keyword in sql_keywords:
-        lines = re.split(keyword, query)
-        query = join_lines_with_keyword(f"\n{keyword}\n\t", lines)
-    return query
+@functools.lru_cache(maxsize=64)
+def compile_sql_keywords_pattern(sql_keywords: Tuple[str, ...], ignore_case: bool = False) -> re.Pattern:
+    """
+    Compile one pattern that finds all keywords in a single pass and skips string literals and comments
+    Keywords are matched literally, longer keywords first so that ORDER BY wins over BY
+    :param sql_keywords: tuple of keywords
+    :param ignore_case:
+    :return: compiled pattern with skip and keyword groups
+    """
+    keywords = sorted(set(sql_keywords), key=len, reverse=True)
+    keywords_alternation = "|".join(re.escape(keyword) for keyword in keywords) or "(?!)"
+    flags = re.DOTALL | (re.IGNORECASE if ignore_case else 0)
+    return re.compile(f"(?P<skip>{SQL_SKIP_PATTERN})|(?P<keyword>{keywords_alternation})", flags)
+
+
+def format_sql_query(sql_keywords, query, ignore_case: bool = False):
+    """
+    Put every keyword of the query on its own line and indent what follows it
+    Keywords inside string literals and comments are left as they are
+    :param sql_keywords: list of keywords like SELECT, FROM, WHERE
+    :param query:
+    :param ignore_case: whether to match keywords regardless of case, they are written as given in sql_keywords
+    :return: formatted query
+    """
+    sql_keywords = tuple(sql_keywords)
+    pattern = compile_sql_keywords_pattern(sql_keywords, ignore_case)
+    keywords_by_match = {keyword.lower() if ignore_case else keyword: keyword for keyword in sql_keywords}
+
+    def replace(match: re.Match) -> str:
+        if match.group("skip") is not None:
+            return match.group("skip")
+        keyword = match.group("keyword")
+        return f"\n{keywords_by_match[keyword.lower() if ignore_case else keyword]}\n\t"
+
+    return pattern.sub(replace, query)
+
+
+class LineIndex:
+    """
+    Index of lines of a memory-mapped text file, built once and used to slice the same big file many times
+    Keeps offset of every line and positions of every distinct line value, lines are decoded only when they are accessed
+    Lines are the same as read_text().split("\\n") would give
+    Lines are found by splitting raw bytes on newline, so only encodings that write ASCII characters as single bytes
+    are supported (and utf-8-sig, whose byte order mark is skipped)
+    """
+
+    def __init__(self, afile: pathlib.Path, encoding: str = "utf-8", chunk_size: int = 1 << 26) -> None:
+        """
+        constructor.
+
+        :param afile: text file to index
+        :param encoding: ASCII compatible encoding like utf-8, latin-1 or cp932
+        :param chunk_size: number of bytes scanned for newlines at once
+        :raises ValueError: if encoding is not ASCII compatible, e.g. utf-16
+        """
+        skip_bom = codecs.lookup(encoding).name == "utf-8-sig"
+        if skip_bom:
+            encoding = "utf-8"
+        if not _is_ascii_compatible_encoding(encoding):
+            raise ValueError(
+                f"LineIndex cannot index {encoding} encoded files, lines are split on raw newline bytes "
+                "so the encoding must be ASCII compatible"
+            )
+        self.afile = afile
+        self.encoding = encoding
+        self._file = open(afile, "rb")
+        size = afile.stat().st_size
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        bom_size = len(codecs.BOM_UTF8) if skip_bom and self._mm[: len(codecs.BOM_UTF8)] == codecs.BOM_UTF8 else 0
+        newline_offsets = []
+        for chunk_start in range(0, size, chunk_size):
+            chunk = np.frombuffer(self._mm[chunk_start : chunk_start + chunk_size], dtype=np.uint8)
+            newline_offsets.append(np.flatnonzero(chunk == ord("\n")) + chunk_start)
+        line_ends = np.concatenate(newline_offsets + [np.array([size])]).astype(np.int64)
+        self.line_starts = np.concatenate([[bom_size], line_ends[:-1] + 1]).astype(np.int64)
+        self.line_ends = line_ends
+        self.positions: Dict[str, List[int]] = {}
+        for line_no in range(len(self)):
+            self.positions.setdefault(self[line_no], []).append(line_no)
+
+    def __len__(self) -> int:
+        """
+        override __len__
+
+        :return: Number of lines
+        """
+        return len(self.line_starts)
+
+    def __getitem__(self, line_no: int) -> str:
+        """
+        Decode one line
+
+        :param line_no: line number starting from 0
+        :return: line without newline
+        """
+        line = self._mm[self.line_starts[line_no] : self.line_ends[line_no]].decode(self.encoding)
+        return line[:-1] if line.endswith("\r") else line
+
+    def index(self, line_value: str, start: int = 0) -> int:
+        """
+        First position of a line value at or after start, like list.index but O(1) for the first occurrence
+
+        :param line_value: line to look for
+        :param start: position to start looking from
+        :return: line number
+        """
+        for position in self.positions.get(line_value, []):
+            if position >= start:
+                return position
+        raise ValueError(f"{line_value!r} is not in {self.afile}")
+
+    def iter_lines(self, start: int = 0, end: int = None):
+        """
+        Lazily iterate lines between start and end, end is exclusive
+
+        :param start:
+        :param end:
+        :return: generator of lines
+        """
+        end = len(self) if end is None else end
+        for line_no in range(start, end):
+            yield self[line_no]
+
+    def get_section_boundaries(self, line_one: str, line_two: str) -> Tuple[int, int]:
+        """
+        Line numbers of the first occurrences of two lines
+
+        :param line_one: first line of the section
+        :param line_two: last line of the section
+        :return: start and end line numbers, both inclusive
+        """
+        return self.index(line_one), self.index(line_two)
+
+    def extract_subtext(self, line_one: str, line_two: str) -> List[str]:
+        """
+        Same as extract_subtext_from_big_text, lines from line_one to line_two inclusive
+
+        :param line_one: first line of the section
+        :param line_two: last line of the section
+        :return: list of lines
+        """
+        start_idx, end_idx = self.get_section_boundaries(line_one, line_two)
+        return list(self.iter_lines(start_idx, end_idx + 1))
+
+    def close(self) -> None:
+        """
+        Close memory map and file
+        """
+        if isinstance(self._mm, mmap.mmap):
+            self._mm.close()
+        self._file.close()
+
+    def __enter__(self) -> "LineIndex":
+        """
+        Use LineIndex as context manager that closes the file on exit
+
+        :return: the index itself
+        """
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        """
+        Close memory map and file
+        """
+        self.close()
 
 
 def extract_subtext_from_big_text(big_text_lines, line_one, line_two):
+    """
+    Extract lines between first occurrences of line_one and line_two, inclusive
+    :param big_text_lines: list of lines or LineIndex
+    :param line_one:
+    :param line_two:
+    :return:
+    """
+    if isinstance(big_text_lines, LineIndex):
+        return big_text_lines.extract_subtext(line_one, line_two)
     start_idx = big_text_lines.index(line_one)
     end_idx = big_text_lines.index(line_two)
     return big_text_lines[start_idx : end_idx + 1]
@@ -68,16 +273,84 @@ def extract_lines_that_match_pattern(
 ) -> List[str]:
     """
     Extract lines matching certain pattern from list of lines
+    Pattern is compiled once and lines where it is not found are skipped
     """
-    filtered_lines = [
-        line for line in lines if re.search(thepattern, line).group() == match_value
-    ]
+    compiled_pattern = re.compile(thepattern)
+    filtered_lines = []
+    for line in lines:
+        match = compiled_pattern.search(line)
+        if match is not None and match.group() == match_value:
+            filtered_lines.append(line)
     return filtered_lines
 
 
-def save_lines_to_file(file: pathlib.Path, lines: List,encoding:str="utf-8"):
-    file.write_text("\n".join(lines),encoding=encoding)
-    logging.info(f"Saved {len(lines)} lines to {file}")
+def save_lines_to_file(file: pathlib.Path, lines: Iterable, encoding: str = "utf-8", compression: str = None):
+    """
+    Save lines to file joined with newline, lines can be any iterable including generators
+    :param file:
+    :param lines:
+    :param encoding:
+    :param compression: None, gzip, zstd or infer from file suffix
+    :return:
+    """
+    write_lines_to_file(file, lines, encoding=encoding, compression=compression)
+
+
+def open_file_for_writing(
+    file: pathlib.Path, encoding: str = "utf-8", buffer_size: int = 1 << 20, compression: str = None
+):
+    """
+    Open text file for writing through a large buffer, optionally compressing on the fly
+    zstd compression needs zstandard package
+    :param file:
+    :param encoding:
+    :param buffer_size: write buffer size in bytes
+    :param compression: None, gzip, zstd or infer to pick it from file suffix (.gz, .zst)
+    :return: file object opened in text mode
+    """
+    if compression == "infer":
+        compression = COMPRESSION_BY_SUFFIX.get(file.suffix.lower())
+    if compression is None:
+        return open(file, "w", encoding=encoding, buffering=buffer_size)
+    if compression == "gzip":
+        return io.TextIOWrapper(
+            io.BufferedWriter(gzip.open(file, "wb"), buffer_size=buffer_size), encoding=encoding
+        )
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError as e:
+            raise ImportError("zstd compression requires zstandard package: pip install zstandard") from e
+        return zstandard.open(file, "wt", encoding=encoding)
+    raise ValueError(f"unsupported compression {compression}, expected one of gzip, zstd or infer")
+
+
+def write_lines_to_file(
+    file: pathlib.Path,
+    lines: Iterable,
+    encoding: str = "utf-8",
+    buffer_size: int = 1 << 20,
+    compression: str = None,
+    separator: str = "\n",
+) -> int:
+    """
+    Stream lines into a file through a large buffer without joining them into one string first
+    :param file:
+    :param lines: any iterable of strings, including generators
+    :param encoding:
+    :param buffer_size: write buffer size in bytes
+    :param compression: None, gzip, zstd or infer to pick it from file suffix (.gz, .zst)
+    :param separator: string written between lines
+    :return: number of written lines
+    """
+    start_time = time.perf_counter()
+    with open_file_for_writing(file, encoding, buffer_size, compression) as out:
+        line_count = _write_lines(lines, out, separator)
+    elapsed = time.perf_counter() - start_time
+    logging.info(
+        f"Saved {line_count} lines to {file} ({line_count / elapsed if elapsed else 0:.0f} lines per second)"
+    )
+    return line_count
 
 
 def combine_lines_to_string(lines, join_char="\n"):
@@ -85,17 +358,16 @@ def combine_lines_to_string(lines, join_char="\n"):
 
 
 def extract_switches_values(text):
-    """
+    r"""
     why are we wrapping the part before \\s+ in parantheses
     The parentheses are used to define a capturing group in the regular expression. A capturing group captures the text matched by the group for later use, such as extracting it as a separate item from the match.
     In this case, the first capturing group (-[a-zA-Z]+) matches the switch, which begins with a hyphen and is followed by one or more letters. The second capturing group (\S+) matches the value that follows the switch, which is one or more non-whitespace characters.
     By wrapping each of these parts in a capturing group, we can extract both the switch and its value as separate items from each match. The re.findall function returns a list of all matches, where each match is a tuple of the capturing groups' values in the order they are defined in the pattern.
-    Therefore, switch_value_regex.findall(text) returns a list of tuples, where each tuple contains the switch and its value, which we can then convert to a dictionary using dict for easier access.
+    Therefore, SWITCH_VALUE_PATTERN.findall(text) returns a list of tuples, where each tuple contains the switch and its value, which we can then convert to a dictionary using dict for easier access.
     :param text:
     :return:
     """
-    switch_value_regex = re.compile(r"(-[a-zA-Z]+)\s+(\S+)")
-    switches_values = switch_value_regex.findall(text)
+    switches_values = SWITCH_VALUE_PATTERN.findall(text)
     return dict(switches_values)
 
 
@@ -123,6 +395,310 @@ def remove_duplicate_lines_in_text(
     return ConfigDict({"new_file": new_file, "newtxtcnt": cnt})
 
 
+LINE_RECORD_DTYPE = np.dtype([("hash", "<i8"), ("line_no", "<i8")])
+
+
+def iterate_lines_of_file(afile: pathlib.Path, encoding: str = "utf-8", buffer_size: int = 1 << 20):
+    """
+    Iterate lines of a file without trailing newline, reading it through a large buffer
+    Lines are the same as read_text().split("\n") would give, including the last empty line of a file that ends with newline
+    :param afile:
+    :param encoding:
+    :param buffer_size: read buffer size in bytes
+    :return: generator of lines
+    """
+    with open(afile, "r", encoding=encoding, buffering=buffer_size) as f:
+        ends_with_newline = True
+        for line in f:
+            ends_with_newline = line.endswith("\n")
+            yield line[:-1] if ends_with_newline else line
+        if ends_with_newline:
+            yield ""
+
+
+def _write_line_hash_partitions(
+    afile: pathlib.Path,
+    temp_folder: pathlib.Path,
+    name: str,
+    encoding: str,
+    buffer_size: int,
+    n_partitions: int,
+    batch_size: int = 1_000_000,
+) -> Tuple[int, List[pathlib.Path]]:
+    """
+    Spill (hash, line number) records of every line of a file into partition files by hash
+    :return: number of lines and partition files
+    """
+    partition_files = [temp_folder / f"{name}_partition_{idx}.bin" for idx in range(n_partitions)]
+    line_count = 0
+    with ExitStack() as stack:
+        partition_handles = [stack.enter_context(open(file, "wb")) for file in partition_files]
+        lines = iterate_lines_of_file(afile, encoding, buffer_size)
+        while True:
+            hashes = [hash(line) for line in itertools.islice(lines, batch_size)]
+            if not hashes:
+                break
+            records = np.empty(len(hashes), dtype=LINE_RECORD_DTYPE)
+            records["hash"] = hashes
+            records["line_no"] = np.arange(line_count, line_count + len(hashes))
+            line_count += len(hashes)
+            partitions = records["hash"] % n_partitions
+            for idx, handle in enumerate(partition_handles):
+                records[partitions == idx].tofile(handle)
+    return line_count, partition_files
+
+
+def _read_first_line_records(partition_file: pathlib.Path) -> np.ndarray:
+    """
+    Read a partition file and keep the record of the first occurrence of each line hash, the file is removed afterwards
+    :return: records sorted by hash
+    """
+    records = np.fromfile(partition_file, dtype=LINE_RECORD_DTYPE)
+    partition_file.unlink()
+    records = records[np.lexsort((records["line_no"], records["hash"]))]
+    is_first = np.r_[True, records["hash"][1:] != records["hash"][:-1]] if len(records) else np.zeros(0, dtype=bool)
+    return records[is_first]
+
+
+def _merge_line_numbers_of_partitions(line_numbers_per_partition, temp_folder: pathlib.Path):
+    """
+    Save line numbers of each partition sorted on disk and merge them back into one ascending stream
+    :param line_numbers_per_partition: iterable of line number arrays, one per partition
+    :param temp_folder:
+    :return: generator of line numbers in ascending order
+    """
+    keep_files = []
+    for idx, line_numbers in enumerate(line_numbers_per_partition):
+        if not len(line_numbers):
+            continue
+        keep_file = temp_folder / f"keep_{idx}.bin"
+        np.sort(line_numbers).tofile(keep_file)
+        keep_files.append(keep_file)
+    return heapq.merge(*[np.memmap(keep_file, dtype="<i8", mode="r") for keep_file in keep_files])
+
+
+def _iterate_lines_at_line_numbers(afile: pathlib.Path, line_numbers, encoding: str, buffer_size: int):
+    """
+    Iterate lines of a file whose line numbers are in an ascending stream of line numbers
+    """
+    next_keep = next(line_numbers, None)
+    for line_no, line in enumerate(iterate_lines_of_file(afile, encoding, buffer_size)):
+        if next_keep is None:
+            break
+        if line_no == next_keep:
+            yield line
+            next_keep = next(line_numbers, None)
+
+
+def _write_lines(lines, out, separator: str = "\n") -> int:
+    """
+    Write lines joined with separator to an open text file
+    :return: number of written lines
+    """
+    line_count = 0
+    current_separator = ""
+    for line in lines:
+        out.write(current_separator)
+        out.write(line)
+        current_separator = separator
+        line_count += 1
+    return line_count
+
+
+def _get_first_line_numbers_of_unique_lines_externally(
+    original_file: pathlib.Path,
+    temp_folder: pathlib.Path,
+    encoding: str,
+    buffer_size: int,
+    n_partitions: int,
+):
+    """
+    Find line numbers of the first occurrence of each distinct line, keeping only one partition of line hashes in memory
+    Line hashes are partitioned into files by hash, each partition is deduplicated with numpy sort,
+    and sorted line numbers of partitions are merged back
+    :return: number of lines and generator of line numbers to keep in ascending order
+    """
+    line_count, partition_files = _write_line_hash_partitions(
+        original_file, temp_folder, "lines", encoding, buffer_size, n_partitions
+    )
+    keep_line_numbers = _merge_line_numbers_of_partitions(
+        (_read_first_line_records(partition_file)["line_no"] for partition_file in partition_files), temp_folder
+    )
+    return line_count, keep_line_numbers
+
+
+def _iterate_unique_lines_by_membership(
+    file_one: pathlib.Path,
+    file_two: pathlib.Path,
+    keep_members: bool,
+    encoding: str,
+    buffer_size: int,
+    external_sort: bool,
+    n_partitions: int,
+    temp_folder: pathlib.Path,
+):
+    """
+    Iterate unique lines of file_one in first-seen order that are (keep_members=True) or are not in file_two
+    """
+    if external_sort:
+        with tempfile.TemporaryDirectory(dir=temp_folder) as tmpdir:
+            _, partitions_one = _write_line_hash_partitions(
+                file_one, pathlib.Path(tmpdir), "one", encoding, buffer_size, n_partitions
+            )
+            _, partitions_two = _write_line_hash_partitions(
+                file_two, pathlib.Path(tmpdir), "two", encoding, buffer_size, n_partitions
+            )
+
+            def select_line_numbers():
+                for partition_one, partition_two in zip(partitions_one, partitions_two):
+                    records = _read_first_line_records(partition_one)
+                    other_hashes = np.fromfile(partition_two, dtype=LINE_RECORD_DTYPE)["hash"]
+                    partition_two.unlink()
+                    is_member = np.isin(records["hash"], other_hashes)
+                    yield records["line_no"][is_member == keep_members]
+
+            keep_line_numbers = _merge_line_numbers_of_partitions(select_line_numbers(), pathlib.Path(tmpdir))
+            yield from _iterate_lines_at_line_numbers(file_one, keep_line_numbers, encoding, buffer_size)
+            del keep_line_numbers
+        return
+    other_hashes = {hash(line) for line in iterate_lines_of_file(file_two, encoding, buffer_size)}
+    seen_hashes = set()
+    for line in iterate_lines_of_file(file_one, encoding, buffer_size):
+        line_hash = hash(line)
+        if line_hash in seen_hashes:
+            continue
+        seen_hashes.add(line_hash)
+        if (line_hash in other_hashes) == keep_members:
+            yield line
+
+
+def iterate_file_diff(
+    file_one: pathlib.Path,
+    file_two: pathlib.Path,
+    encoding: str = "utf-8",
+    buffer_size: int = 1 << 20,
+    external_sort: bool = False,
+    n_partitions: int = 16,
+    temp_folder: pathlib.Path = None,
+):
+    """
+    Streaming version of get_list_diff for files, iterate unique lines of file_one that are not in file_two
+    :param file_one:
+    :param file_two:
+    :param encoding:
+    :param buffer_size: read buffer size in bytes
+    :param external_sort: whether to compare line hashes partitioned on disk instead of in memory hash sets
+    :param n_partitions: number of partitions used by external_sort, each of them should fit in memory
+    :param temp_folder: folder for external_sort partitions, system temp folder by default
+    :return: generator of lines in first-seen order
+    """
+    yield from _iterate_unique_lines_by_membership(
+        file_one, file_two, False, encoding, buffer_size, external_sort, n_partitions, temp_folder
+    )
+
+
+def iterate_file_intersection(
+    file_one: pathlib.Path,
+    file_two: pathlib.Path,
+    encoding: str = "utf-8",
+    buffer_size: int = 1 << 20,
+    external_sort: bool = False,
+    n_partitions: int = 16,
+    temp_folder: pathlib.Path = None,
+):
+    """
+    Streaming version of get_intersection for files, iterate unique lines of file_one that are also in file_two
+    :param file_one:
+    :param file_two:
+    :param encoding:
+    :param buffer_size: read buffer size in bytes
+    :param external_sort: whether to compare line hashes partitioned on disk instead of in memory hash sets
+    :param n_partitions: number of partitions used by external_sort, each of them should fit in memory
+    :param temp_folder: folder for external_sort partitions, system temp folder by default
+    :return: generator of lines in first-seen order
+    """
+    yield from _iterate_unique_lines_by_membership(
+        file_one, file_two, True, encoding, buffer_size, external_sort, n_partitions, temp_folder
+    )
+
+
+def remove_duplicate_lines_in_large_file(
+    original_file: pathlib.Path,
+    refined_filename: str = None,
+    buffer_size: int = 1 << 20,
+    keep_counts: bool = False,
+    external_sort: bool = False,
+    n_partitions: int = 16,
+    temp_folder: pathlib.Path = None,
+    encoding: str = "utf-8",
+):
+    """
+    Streaming version of remove_duplicate_lines_in_text for files that do not fit in memory
+    Lines are read one by one and unique lines are written out in first-seen order, same output as remove_duplicate_lines_in_text
+    Only 64 bit hashes of seen lines are kept in memory, two different lines with colliding hashes are extremely unlikely but possible
+    With external_sort line hashes are spilled to n_partitions files in temp_folder and the file is read twice
+    :param original_file:
+    :param refined_filename:
+    :param buffer_size: read and write buffer size in bytes
+    :param keep_counts: whether to count occurrences of each line, this keeps every distinct line in memory
+    :param external_sort: whether to deduplicate line hashes on disk
+    :param n_partitions: number of partitions used by external_sort, each of them should fit in memory
+    :param temp_folder: folder for external_sort partitions, system temp folder by default
+    :param encoding:
+    :return: new file, counts of lines if keep_counts is True and number of lines before and after deduplication
+    """
+    if keep_counts and external_sort:
+        raise ValueError("keep_counts is not supported together with external_sort")
+    if not refined_filename:
+        refined_filename = original_file.stem + "_refined" + original_file.suffix
+    new_file = original_file.parent / refined_filename
+    start_time = time.perf_counter()
+    line_count = 0
+    unique_line_count = 0
+    counts = Counter()
+    with open(new_file, "w", encoding=encoding, buffering=buffer_size) as out:
+        separator = ""
+        if external_sort:
+            with tempfile.TemporaryDirectory(dir=temp_folder) as tmpdir:
+                line_count, keep_line_numbers = _get_first_line_numbers_of_unique_lines_externally(
+                    original_file, pathlib.Path(tmpdir), encoding, buffer_size, n_partitions
+                )
+                unique_line_count = _write_lines(
+                    _iterate_lines_at_line_numbers(original_file, keep_line_numbers, encoding, buffer_size), out
+                )
+                del keep_line_numbers
+        else:
+            seen_hashes = set()
+            for line in iterate_lines_of_file(original_file, encoding, buffer_size):
+                line_count += 1
+                if keep_counts:
+                    counts[line] += 1
+                    if counts[line] > 1:
+                        continue
+                else:
+                    line_hash = hash(line)
+                    if line_hash in seen_hashes:
+                        continue
+                    seen_hashes.add(line_hash)
+                out.write(separator)
+                out.write(line)
+                separator = "\n"
+                unique_line_count += 1
+    elapsed = time.perf_counter() - start_time
+    logging.info(
+        f"reduced number of lines in {original_file} from {line_count} to {unique_line_count} "
+        f"({line_count / elapsed if elapsed else 0:.0f} lines per second)"
+    )
+    return ConfigDict(
+        {
+            "new_file": new_file,
+            "newtxtcnt": counts if keep_counts else None,
+            "line_count": line_count,
+            "unique_line_count": unique_line_count,
+        }
+    )
+
+
 def get_sorted_non_zero_words_and_freqs_from_csr_mat_row(
     csr_matrix_row, tfidf_features
 ):
@@ -135,13 +711,48 @@ def get_sorted_non_zero_words_and_freqs_from_csr_mat_row(
     :param tfidf_features:
     :return:
     """
-    items = [
-        (w, csr_matrix_row[0, idx])
-        for idx, w in enumerate(tfidf_features)
-        if csr_matrix_row[0, idx] > 0
+    return sort_non_zero_words_and_freqs(
+        csr_matrix_row.indices, csr_matrix_row.data, tfidf_features
+    )
+
+
+def sort_non_zero_words_and_freqs(indices, data, tfidf_features, top_n: int = None):
+    """
+    Sort non-zero entries of one csr_matrix row, given as its indices and data arrays, by their word frequency
+    Words with the same frequency keep their feature order
+    :param indices: column indices of the row non-zero entries
+    :param data: values of the row non-zero entries
+    :param tfidf_features:
+    :param top_n: keep only top_n words with highest frequency, by default keep all
+    :return: list of (word, frequency) in ascending order of frequency
+    """
+    positive = data > 0
+    indices, data = indices[positive], data[positive]
+    order = np.lexsort((indices, data))
+    if top_n is not None:
+        order = order[max(len(order) - top_n, 0):]
+    return [(tfidf_features[indices[i]], data[i]) for i in order]
+
+
+def get_sorted_non_zero_words_and_freqs_from_csr_mat(csr_matrix, tfidf_features, top_n: int = None):
+    """
+    Batched version of get_sorted_non_zero_words_and_freqs_from_csr_mat_row that walks indptr of the whole csr_matrix
+    :param csr_matrix: csr_matrix with one row per message
+    :param tfidf_features:
+    :param top_n: keep only top_n words with highest frequency per row, by default keep all
+    :return: list with one list of (word, frequency) per row
+    """
+    csr_matrix = csr_matrix.tocsr()
+    indptr, indices, data = csr_matrix.indptr, csr_matrix.indices, csr_matrix.data
+    return [
+        sort_non_zero_words_and_freqs(
+            indices[indptr[row]: indptr[row + 1]],
+            data[indptr[row]: indptr[row + 1]],
+            tfidf_features,
+            top_n,
+        )
+        for row in range(csr_matrix.shape[0])
     ]
-    items = sorted(items, key=lambda item: item[-1])
-    return items
 
 
 def get_common_common_part_of_message_across_documents(
@@ -163,18 +774,32 @@ def get_common_common_part_of_message_across_documents(
     )
     words_and_freqs = sorted(words_and_freqs, key=lambda item: item[-1])
     words_and_freqs = words_and_freqs[: -1 * throw_off_thresh]
-    words = [word for (word, freq) in words_and_freqs]
+    words = {word for (word, freq) in words_and_freqs}
     return " ".join([token for token in tokens if token.lower() in words])
 
 
-def get_message_clusters(messages, n_components=7):
+def get_message_clusters(
+    messages,
+    n_components=7,
+    similarity_threshold=0.9,
+    use_minibatch_nmf=False,
+    batch_size=1024,
+    algorithm="auto",
+    n_jobs=None,
+):
     """
     We are trying to categorize a list of messages into clusters
     To achieve this we first convert all messages to word frequency sparce matrix via TfidfVectorizer
     Then we reduce csr_matrix dimension to n_components principal components with NMF (Non-negative Factorizing Model)
-    Finally we compute similarities between messages taking dot products and assign a cluster label to each message based on that calculation
+    Finally we assign a cluster label to each message based on cosine similarities between normalized NMF features
+    Similar messages are found with a radius neighbors search instead of taking dot products against every message
     :param messages:
     :param n_components:
+    :param similarity_threshold: messages with cosine similarity above this threshold end up in the same cluster
+    :param use_minibatch_nmf: whether to use MiniBatchNMF, which is much faster on large number of messages
+    :param batch_size: batch size of MiniBatchNMF
+    :param algorithm: NearestNeighbors algorithm, ball_tree works well with small n_components
+    :param n_jobs: number of parallel jobs for neighbors search
     :return:
     """
     # TfidfVectorizer trains on our messages and transforms them to a sparse matrix
@@ -187,18 +812,26 @@ def get_message_clusters(messages, n_components=7):
     logging.info(f"sparce matrix shape : {csr_mat.shape}")
 
     # tfidf features (tokens) across all messages
-    tfidf_features = tfidf.get_feature_names()
+    tfidf_features = tfidf.get_feature_names_out()
     logging.info(
         f"there are total of {len(tfidf_features)} tfidf features for specified messages"
     )
 
     # NMF to reduce csr_matr dimensionality to principal components
-    nmf = NMF(n_components=n_components)
+    if use_minibatch_nmf:
+        nmf = MiniBatchNMF(n_components=n_components, batch_size=batch_size)
+    else:
+        nmf = NMF(n_components=n_components)
     nmf_features = nmf.fit_transform(csr_mat)
 
     # normalize nmf features
     norm_nmf_features = normalize(nmf_features)
 
+    # cosine similarity above threshold is the same as euclidean distance below this radius for normalized vectors
+    radius = np.sqrt(max(2 - 2 * similarity_threshold, 0.0))
+    neighbors = NearestNeighbors(radius=radius, algorithm=algorithm, n_jobs=n_jobs)
+    neighbors.fit(norm_nmf_features)
+
     # initial a dictionary to hold messages and their mapped cluster
     clustered_messages = {}
 
@@ -207,10 +840,13 @@ def get_message_clusters(messages, n_components=7):
             essential_part = get_common_common_part_of_message_across_documents(
                 message, tokenizer, csr_mat[idx], tfidf_features, 1
             )
-            similarities = norm_nmf_features.dot(norm_nmf_features[idx, :])
-            for msg_idx, similarity in enumerate(similarities):
-                if similarity > 0.9:
-                    clustered_messages[messages[msg_idx]] = essential_part
+            candidates = neighbors.radius_neighbors(
+                norm_nmf_features[idx : idx + 1], return_distance=False
+            )[0]
+            candidates = np.sort(candidates)
+            similarities = norm_nmf_features[candidates].dot(norm_nmf_features[idx, :])
+            for msg_idx in candidates[similarities > similarity_threshold]:
+                clustered_messages[messages[msg_idx]] = essential_part
 
     logging.info(
         f"total of {len(clustered_messages)} distinct messages were mapped to {len(set(clustered_messages.values()))} distinct clusters"
@@ -226,6 +862,331 @@ def get_message_clusters(messages, n_components=7):
     )
 
 
+class OnlineMessageClusterer:
+    """
+    Stateful version of get_message_clusters for a sliding window of messages
+    Messages are vectorized with a HashingVectorizer, so there is no vocabulary to refit, and MiniBatchNMF is updated with partial_fit
+    Each cluster is represented by the normalized NMF features of its first message, so assigning a message costs O(number of clusters)
+    """
+
+    STATE_FILENAME = "online_message_clusterer.joblib"
+
+    def __init__(
+        self,
+        n_components: int = 7,
+        similarity_threshold: float = 0.9,
+        n_features: int = 2**16,
+        batch_size: int = 1024,
+        throw_off_thresh: int = 1,
+    ) -> None:
+        """
+        constructor.
+
+        :param n_components: number of NMF components
+        :param similarity_threshold: messages with cosine similarity above this threshold join the cluster
+        :param n_features: number of hashed token features
+        :param batch_size: batch size of MiniBatchNMF
+        :param throw_off_thresh: number of rarest tokens dropped from a message to get its cluster label
+        """
+        self.n_components = n_components
+        self.similarity_threshold = similarity_threshold
+        self.n_features = n_features
+        self.batch_size = batch_size
+        self.throw_off_thresh = throw_off_thresh
+        self.nmf = MiniBatchNMF(n_components=n_components, batch_size=batch_size)
+        self.doc_freq = np.zeros(n_features, dtype=np.int64)
+        self.n_docs = 0
+        self.seed_vectors = csr_matrix((0, n_features))
+        self.cluster_labels: List[str] = []
+        self.centroids = np.zeros((0, n_components))
+        self._init_vectorizer()
+
+    def _init_vectorizer(self) -> None:
+        """
+        Create the stateless vectorizer and tokenizer from parameters
+        """
+        self.vectorizer = HashingVectorizer(
+            n_features=self.n_features, alternate_sign=False, norm="l2"
+        )
+        self.tokenizer = self.vectorizer.build_tokenizer()
+
+    @property
+    def n_clusters(self) -> int:
+        """
+        Number of clusters found so far
+
+        :return: Number of clusters
+        """
+        return len(self.cluster_labels)
+
+    @property
+    def is_fitted(self) -> bool:
+        """
+        Whether partial_fit was called at least once
+
+        :return: True if NMF components are available
+        """
+        return hasattr(self.nmf, "components_")
+
+    def _refresh_centroids(self) -> None:
+        """
+        Recompute cluster centroids from their seed messages with the current NMF components
+        """
+        if self.seed_vectors.shape[0]:
+            self.centroids = normalize(self.nmf.transform(self.seed_vectors))
+
+    def partial_fit(self, messages: List[str]) -> "OnlineMessageClusterer":
+        """
+        Update token document frequencies and NMF components with new messages
+
+        :param messages: new messages
+        :return: the clusterer itself
+        """
+        csr_mat = self.vectorizer.transform(messages)
+        self.doc_freq += np.bincount(csr_mat.indices, minlength=self.n_features)
+        self.n_docs += csr_mat.shape[0]
+        self.nmf.partial_fit(csr_mat)
+        self._refresh_centroids()
+        return self
+
+    def get_essential_part(self, message: str) -> str:
+        """
+        Common part of a message, which is its tokens without the rarest throw_off_thresh tokens
+
+        :param message: message
+        :return: tokens joined with space
+        """
+        tokens = self.tokenizer(message)
+        unique_tokens = list(dict.fromkeys(token.lower() for token in tokens))
+        if not unique_tokens:
+            return message
+        token_features = self.vectorizer.transform(unique_tokens).indices
+        idf = np.log((1 + self.n_docs) / (1 + self.doc_freq[token_features])) + 1
+        order = np.argsort(idf, kind="stable")
+        words = {unique_tokens[i] for i in order[: len(order) - self.throw_off_thresh]}
+        return " ".join([token for token in tokens if token.lower() in words])
+
+    def assign(self, messages: List[str], create_clusters: bool = True) -> Dict[str, str]:
+        """
+        Assign messages to existing clusters without refitting, and start new clusters for messages that match none
+
+        :param messages: messages to assign
+        :param create_clusters: whether unmatched messages start new clusters, otherwise they are left out
+        :return: dictionary that maps messages to their cluster label, same as clustered_messages of get_message_clusters
+        """
+        if not self.is_fitted:
+            self.partial_fit(messages)
+        csr_mat = self.vectorizer.transform(messages)
+        norm_nmf_features = normalize(self.nmf.transform(csr_mat))
+        clustered_messages = {}
+        new_seed_rows = []
+        for idx, message in enumerate(messages):
+            if message in clustered_messages:
+                continue
+            if self.n_clusters:
+                similarities = self.centroids.dot(norm_nmf_features[idx])
+                best = int(np.argmax(similarities))
+                if similarities[best] > self.similarity_threshold:
+                    clustered_messages[message] = self.cluster_labels[best]
+                    continue
+            if create_clusters:
+                essential_part = self.get_essential_part(message)
+                clustered_messages[message] = essential_part
+                if norm_nmf_features[idx].any():
+                    new_seed_rows.append(idx)
+                    self.cluster_labels.append(essential_part)
+                    self.centroids = np.vstack([self.centroids, norm_nmf_features[idx]])
+        if new_seed_rows:
+            self.seed_vectors = vstack([self.seed_vectors, csr_mat[new_seed_rows]]).tocsr()
+        logging.info(
+            f"assigned {len(clustered_messages)} distinct messages, there are {self.n_clusters} clusters now"
+        )
+        return clustered_messages
+
+    def save(self, folder: pathlib.Path) -> pathlib.Path:
+        """
+        Save state of the clusterer to a folder, numpy arrays are stored so that they can be memory-mapped on load
+
+        :param folder: folder to save into
+        :return: path of the saved state file
+        """
+        folder.mkdir(parents=True, exist_ok=True)
+        state_file = folder / self.STATE_FILENAME
+        state = {key: val for key, val in self.__dict__.items() if key not in ("vectorizer", "tokenizer")}
+        joblib.dump(state, state_file)
+        logging.info(f"Saved clusterer with {self.n_clusters} clusters to {state_file}")
+        return state_file
+
+    @classmethod
+    def load(cls, folder: pathlib.Path, mmap_mode: str = "c") -> "OnlineMessageClusterer":
+        """
+        Load clusterer saved with save, numpy arrays are memory-mapped instead of read into memory
+
+        :param folder: folder that has the saved state
+        :param mmap_mode: numpy memory-map mode, copy-on-write by default so that the saved state stays untouched
+        :return: clusterer
+        """
+        clusterer = cls.__new__(cls)
+        clusterer.__dict__.update(joblib.load(folder / cls.STATE_FILENAME, mmap_mode=mmap_mode))
+        clusterer._init_vectorizer()
+        return clusterer
+
+
+LOG_TEMPLATE_WILDCARD = "<*>"
+LOG_TEMPLATE_MASK_PATTERNS = (
+    re.compile(r"\b(?:\d{1,3}\.){3}\d{1,3}(?::\d+)?\b"),
+    re.compile(r"\b0[xX][0-9a-fA-F]+\b"),
+    re.compile(r"(?<![\w.])[-+]?\d+(?:\.\d+)?(?![\w.])"),
+)
+
+
+class LogTemplateMiner:
+    """
+    Streaming log template miner based on Drain fixed-depth parse tree.
+    Messages are grouped by number of tokens and their first tokens, then matched against a few templates in that leaf,
+    so each message is processed once in roughly constant time.
+    Tokens that differ between messages of the same template are replaced with a wildcard.
+    """
+
+    def __init__(
+        self,
+        depth: int = 4,
+        similarity_threshold: float = 0.4,
+        max_children: int = 100,
+        mask_patterns=LOG_TEMPLATE_MASK_PATTERNS,
+    ) -> None:
+        """
+        constructor.
+
+        :param depth: depth of parse tree, depth - 2 leading tokens are used to route a message
+        :param similarity_threshold: share of equal tokens a message needs to join an existing template
+        :param max_children: maximum number of children of a tree node, other tokens share a wildcard child
+        :param mask_patterns: compiled patterns whose matches are masked with a wildcard before mining
+        """
+        self.depth = depth
+        self.similarity_threshold = similarity_threshold
+        self.max_children = max_children
+        self.mask_patterns = mask_patterns
+        self.root: Dict[Any, Any] = {}
+        self.templates: List[List[str]] = []
+        self.template_sizes: List[int] = []
+
+    def mask(self, message: str) -> str:
+        """
+        Mask variable parts of a message such as numbers, hex values and ip addresses
+
+        :param message: message
+        :return: masked message
+        """
+        for pattern in self.mask_patterns:
+            message = pattern.sub(LOG_TEMPLATE_WILDCARD, message)
+        return message
+
+    def _get_leaf(self, tokens: List[str]) -> List[int]:
+        """
+        Walk parse tree by token count and leading tokens, creating missing nodes
+
+        :param tokens: tokens of masked message
+        :return: list of template ids in the leaf
+        """
+        node = self.root.setdefault(len(tokens), {})
+        route = tokens[: max(self.depth - 2, 0)]
+        for level, token in enumerate(route):
+            if any(char.isdigit() for char in token):
+                token = LOG_TEMPLATE_WILDCARD
+            if token not in node:
+                if len(node) >= self.max_children:
+                    token = LOG_TEMPLATE_WILDCARD
+            is_last = level == len(route) - 1
+            node = node.setdefault(token, [] if is_last else {})
+        if not route:
+            node = node.setdefault(LOG_TEMPLATE_WILDCARD, [])
+        return node
+
+    def _similarity(self, template: List[str], tokens: List[str]) -> Tuple[float, int]:
+        """
+        Share of tokens equal to template tokens and number of wildcards in template
+
+        :param template: template tokens
+        :param tokens: message tokens
+        :return: similarity and wildcard count
+        """
+        equal_count = 0
+        wildcard_count = 0
+        for template_token, token in zip(template, tokens):
+            if template_token == LOG_TEMPLATE_WILDCARD:
+                wildcard_count += 1
+            elif template_token == token:
+                equal_count += 1
+        return (equal_count / len(tokens) if tokens else 1.0), wildcard_count
+
+    def add_message(self, message: str) -> Tuple[int, str]:
+        """
+        Add a message to the miner and get its template
+
+        :param message: message
+        :return: template id and current template string of the message
+        """
+        tokens = self.mask(message).split()
+        leaf = self._get_leaf(tokens)
+        best_id, best_key = None, (-1.0, -1)
+        for template_id in leaf:
+            similarity, wildcard_count = self._similarity(self.templates[template_id], tokens)
+            if (similarity, wildcard_count) > best_key:
+                best_id, best_key = template_id, (similarity, wildcard_count)
+        if best_id is not None and (best_key[0] >= self.similarity_threshold or not tokens):
+            template = self.templates[best_id]
+            for idx, token in enumerate(tokens):
+                if template[idx] != token:
+                    template[idx] = LOG_TEMPLATE_WILDCARD
+            self.template_sizes[best_id] += 1
+            return best_id, " ".join(template)
+        best_id = len(self.templates)
+        self.templates.append(tokens)
+        self.template_sizes.append(1)
+        leaf.append(best_id)
+        return best_id, " ".join(tokens)
+
+    def get_template(self, template_id: int) -> str:
+        """
+        Current template string
+
+        :param template_id: template id
+        :return: template string
+        """
+        return " ".join(self.templates[template_id])
+
+
+def get_message_templates(messages, depth=4, similarity_threshold=0.4, max_children=100):
+    """
+    Faster alternative to get_message_clusters that maps messages to log templates in one pass with LogTemplateMiner
+    :param messages:
+    :param depth:
+    :param similarity_threshold:
+    :param max_children:
+    :return: clustered_messages that maps each message to its final template, as well as template ids
+    """
+    miner = LogTemplateMiner(depth, similarity_threshold, max_children)
+    message_template_ids = {}
+    for message in messages:
+        template_id, _ = miner.add_message(message)
+        message_template_ids[message] = template_id
+    clustered_messages = {
+        message: miner.get_template(template_id)
+        for message, template_id in message_template_ids.items()
+    }
+    logging.info(
+        f"total of {len(clustered_messages)} distinct messages were mapped to {len(miner.templates)} templates"
+    )
+    return ConfigDict(
+        {
+            "clustered_messages": clustered_messages,
+            "message_template_ids": message_template_ids,
+            "miner": miner,
+        }
+    )
+
+
 def compare_two_files(file_one: pathlib.Path, file_two: pathlib.Path) -> ConfigDict:
     """
     Compare two files and return the lines that are different
@@ -258,6 +1219,53 @@ def compare_two_files(file_one: pathlib.Path, file_two: pathlib.Path) -> ConfigD
     )
 
 
+def compare_two_large_files(
+    file_one: pathlib.Path,
+    file_two: pathlib.Path,
+    output_folder: pathlib.Path = None,
+    encoding: str = "utf-8",
+    buffer_size: int = 1 << 20,
+    external_sort: bool = False,
+    n_partitions: int = 16,
+    temp_folder: pathlib.Path = None,
+) -> ConfigDict:
+    """
+    Streaming version of compare_two_files for files that do not fit in memory
+    Differences and intersection are written to files instead of being returned as lists
+    :param file_one:
+    :param file_two:
+    :param output_folder: folder to save differences into, folder of file_one by default
+    :param encoding:
+    :param buffer_size: read and write buffer size in bytes
+    :param external_sort: whether to compare line hashes partitioned on disk instead of in memory hash sets
+    :param n_partitions: number of partitions used by external_sort, each of them should fit in memory
+    :param temp_folder: folder for external_sort partitions, system temp folder by default
+    :return: files with differences and intersection as config dict, with the same keys as compare_two_files
+    """
+    if output_folder is None:
+        output_folder = file_one.parent
+    output_folder.mkdir(parents=True, exist_ok=True)
+    options = dict(
+        encoding=encoding,
+        buffer_size=buffer_size,
+        external_sort=external_sort,
+        n_partitions=n_partitions,
+        temp_folder=temp_folder,
+    )
+    results = {}
+    for key, filename, lines in [
+        ("file1_vs_file2", f"{file_one.stem}_vs_{file_two.stem}.txt", iterate_file_diff(file_one, file_two, **options)),
+        ("file2_vs_file1", f"{file_two.stem}_vs_{file_one.stem}.txt", iterate_file_diff(file_two, file_one, **options)),
+        ("intersection", f"{file_one.stem}_and_{file_two.stem}_intersection.txt",
+         iterate_file_intersection(file_one, file_two, **options)),
+    ]:
+        results[key] = output_folder / filename
+        with open(results[key], "w", encoding=encoding, buffering=buffer_size) as out:
+            results[f"{key}_count"] = _write_lines(lines, out)
+        logging.info(f"{key} of {file_one.name} and {file_two.name} : {results[f'{key}_count']} lines")
+    return ConfigDict(results)
+
+
 def get_delimited_records_from_file(
     afile: pathlib.Path, delimiter: str = "\t", encoding="utf-8"
 ) -> List[List[str]]:
@@ -268,9 +1276,96 @@ def get_delimited_records_from_file(
     :param encoding:
     :return: list of lists
     """
-    text = afile.read_text(encoding=encoding)
-    lines = [line for line in text.split("\n") if line != ""]
-    return [line.strip().split(delimiter) for line in lines]
+    return list(iterate_delimited_records_from_file(afile, delimiter, encoding))
+
+
+def _validate_field_count(
+    record: List[str], line_no: int, afile: pathlib.Path, expected_field_count: int, on_bad_record: str
+) -> bool:
+    """
+    Check that record has expected number of fields
+    :return: True if record should be kept
+    """
+    if expected_field_count is None or len(record) == expected_field_count:
+        return True
+    message = f"line {line_no} of {afile} has {len(record)} fields, expected {expected_field_count}"
+    if on_bad_record == "raise":
+        raise ValueError(message)
+    logging.warning(message)
+    return on_bad_record == "keep"
+
+
+def _is_ascii_compatible_encoding(encoding: str) -> bool:
+    """
+    Check that encoding writes ASCII characters as single ASCII bytes, so encoded text can be split on raw newline bytes
+    :param encoding:
+    :return: True for encodings like utf-8, latin-1 or cp932, False for encodings like utf-16 or utf-8-sig
+    """
+    sample = "\n\r\t ,;|azAZ09"
+    return sample.encode(encoding) == sample.encode("ascii")
+
+
+def iterate_delimited_records_from_file(
+    afile: pathlib.Path,
+    delimiter: str = "\t",
+    encoding="utf-8",
+    quotechar: str = None,
+    expected_field_count: int = None,
+    on_bad_record: str = "raise",
+    field_counts: Counter = None,
+):
+    """
+    Lazily iterate delimited records of a file, without reading the whole file into memory
+    Without quotechar the file is memory-mapped and records are the same as get_delimited_records_from_file returns,
+    files in encodings that are not ASCII compatible (e.g. utf-16) are read line by line in text mode instead
+    With quotechar the file is parsed with csv module, so delimiters and newlines inside quoted fields are kept
+    Records are validated in the same pass
+    :param afile: filepath
+    :param delimiter: delimiter character
+    :param encoding:
+    :param quotechar: quote character, for instance '"', by default quotes are not treated specially
+    :param expected_field_count: number of fields every record should have
+    :param on_bad_record: what to do with records that do not have expected_field_count fields: raise, skip or keep
+    :param field_counts: optional Counter that is updated with field counts of records, like get_field_counts_of_records
+    :return: generator of records
+    """
+    if on_bad_record not in ("raise", "skip", "keep"):
+        raise ValueError("on_bad_record must be one of 'raise', 'skip' or 'keep'")
+    if quotechar is not None:
+        with open(afile, "r", encoding=encoding, newline="") as f:
+            reader = csv.reader(f, delimiter=delimiter, quotechar=quotechar)
+            for record in reader:
+                if not record:
+                    continue
+                if field_counts is not None:
+                    field_counts[len(record)] += 1
+                if _validate_field_count(record, reader.line_num, afile, expected_field_count, on_bad_record):
+                    yield record
+        return
+    if not _is_ascii_compatible_encoding(encoding):
+        with open(afile, "r", encoding=encoding) as f:
+            for line_no, line in enumerate(f, start=1):
+                line = line[:-1] if line.endswith("\n") else line
+                if not line:
+                    continue
+                record = line.strip().split(delimiter)
+                if field_counts is not None:
+                    field_counts[len(record)] += 1
+                if _validate_field_count(record, line_no, afile, expected_field_count, on_bad_record):
+                    yield record
+        return
+    if afile.stat().st_size == 0:
+        return
+    with open(afile, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for line_no, raw_line in enumerate(iter(mm.readline, b""), start=1):
+            raw_line = raw_line.rstrip(b"\r\n")
+            if not raw_line:
+                continue
+            record = raw_line.decode(encoding).strip().split(delimiter)
+            if field_counts is not None:
+                field_counts[len(record)] += 1
+            if _validate_field_count(record, line_no, afile, expected_field_count, on_bad_record):
+                yield record
 
 
 def remove_items_with_certain_val_from_list(
@@ -291,4 +1386,4 @@ def extract_words_from_text_and_join_with_char(text:str,join_char:str="_")->str:
     :param join_char:
     :return:
     """
-    return f"{join_char}".join(re.findall(r"\w+",text))
\ No newline at end of file
+    return normalize_text_to_words_joined_with_char(text, join_char)
\ No newline at end of file
@@ -5,6 +5,7 @@ import tempfile
 from sampytools.list_utils import get_list_diff
 
 from sampytools.pandas_utils import extract_dict_keys_to_columns
+import numpy as np
 import pandas as pd
 from sampytools.pandas_utils import remove_nonnumeric_chars_from_numeric_cols
 from sampytools.pandas_utils import read_csv_file_with_multiple_encodings
@@ -76,6 +77,48 @@ class MyTestCase(unittest.TestCase):
         print(df2)
         self.assertTrue(len(df2) > 0)
 
+    def test_list_of_dict_to_dataframe_by_entity(self):
+        from sampytools.pandas_utils import list_of_dict_to_dataframe_by_entity
+
+        records = [
+            {"cust": "c1", "custdim": "age", "custval": 30},
+            {"cust": "c1", "custdim": "height", "custval": 180},
+            {"cust": "c2", "custdim": "age", "custval": 40},
+            {"cust": "c1", "custdim": "age", "custval": 31},
+        ]
+        df = list_of_dict_to_dataframe_by_entity(records, "cust")
+        self.assertEqual(df.index.tolist(), ["c1", "c2"])
+        self.assertEqual(df.columns.tolist(), ["age", "height"])
+        self.assertEqual(df.loc["c1", "age"], 31)
+        self.assertTrue(pd.isna(df.loc["c2", "height"]))
+        df2 = list_of_dict_to_dataframe_by_entity(pd.DataFrame(records[:3]), "cust", "custdim", "custval")
+        self.assertEqual(df2.loc["c1"].tolist(), [30, 180])
+
+    def test_list_of_dict_to_dataframe_by_entity_missing_labels_and_big_ints(self):
+        from sampytools.pandas_utils import list_of_dict_to_dataframe_by_entity
+
+        records = [
+            {"id": "a", "k": "x", "v": 2**60 + 1},
+            {"id": None, "k": "y", "v": 77},
+            {"id": "b", "k": "y", "v": 5},
+            {"id": "b", "k": None, "v": 9},
+        ]
+        df = list_of_dict_to_dataframe_by_entity(records, "id")
+        self.assertEqual(df.shape, (3, 3))
+        self.assertEqual(df.loc["a", "x"], 2**60 + 1)
+        self.assertEqual(df.loc["b", "y"], 5)
+        self.assertTrue(pd.isna(df.loc["a", "y"]))
+        self.assertEqual(str(df["x"].dtype), "Int64")
+
+    def test_list_of_dict_to_dataframe_by_entity_last_repeated_pair_wins(self):
+        from sampytools.pandas_utils import list_of_dict_to_dataframe_by_entity
+
+        for values in (np.arange(1000), np.arange(1000) * 0.5, np.arange(1000).astype(str).astype(object)):
+            records_df = pd.DataFrame({"id": np.arange(1000) % 3, "k": np.arange(1000) % 2, "v": values})
+            df = list_of_dict_to_dataframe_by_entity(records_df, "id")
+            expected = records_df.groupby(["id", "k"])["v"].last().unstack()
+            self.assertEqual(df.loc[expected.index, expected.columns].values.tolist(), expected.values.tolist())
+
     def test_order_merged_dataframe_cols(self):
         from sampytools.pandas_utils import order_merged_dataframe_cols
 
@@ -144,6 +187,16 @@ class MyTestCase(unittest.TestCase):
         print(f"df after : {df.to_string()}")
         self.assertTrue("market_value" in df.columns)
 
+    def test_normalize_index_to_words_joined_with_char(self):
+        from sampytools.pandas_utils import normalize_index_to_words_joined_with_char
+
+        index = pd.Index(["Market Value", "Cusip", "Market Value", "Par-Amount"], name="cols")
+        result = normalize_index_to_words_joined_with_char(index, lowercase=True)
+        self.assertEqual(result.tolist(), ["market_value", "cusip", "market_value", "par_amount"])
+        self.assertEqual(result.name, "cols")
+        with self.assertRaises(TypeError):
+            normalize_index_to_words_joined_with_char(pd.Index(["Market Value", float("nan"), "Cusip"]))
+
     def test_diff_df_maker(self):
         from sampytools.pandas_utils import diff_df_maker  # Adjust import if needed
 
@@ -173,6 +226,81 @@ class MyTestCase(unittest.TestCase):
         self.assertAlmostEqual(result_df["diff_value"].iloc[0], 10)
         self.assertAlmostEqual(result_df["abs_diff_value_pct"].iloc[1], abs((200 / 210 - 1) * 100))
 
+    def test_group_count_top_k_series(self):
+        from sampytools.pandas_utils import group_count_sort_series, group_count_top_k_series
+
+        df = pd.DataFrame({
+            "portfolio": ["A", "A", "A", "B", "B", "B", None],
+            "break_id": [1, 2, 3, 4, None, 6, 7],
+        })
+        result = group_count_top_k_series(df, ["portfolio"], "break_id", top_k=2)
+        expected = group_count_sort_series(df, ["portfolio"], "break_id").head(2)
+        self.assertEqual(result.to_dict(), expected.to_dict())
+        self.assertEqual(result.index.tolist(), ["A", "B"])
+
+    def test_group_count_top_k_series_from_chunks(self):
+        from sampytools.pandas_utils import group_count_sort_series, group_count_top_k_series_from_chunks
+
+        df = pd.DataFrame({
+            "portfolio": ["A", "B", "A", "B", "A", "C"],
+            "asset": ["x", "y", "x", "y", "z", "x"],
+            "break_id": range(6),
+        })
+        chunks = [df.iloc[i:i + 2] for i in range(0, len(df), 2)]
+        result = group_count_top_k_series_from_chunks(chunks, ["portfolio", "asset"], "break_id", top_k=3)
+        expected = group_count_sort_series(df, ["portfolio", "asset"], "break_id")
+        self.assertEqual(result.to_dict(), expected.head(3).to_dict())
+        self.assertEqual(result.iloc[0], 2)
+
+    def test_pandas_multi_index_to_columns(self):
+        from sampytools.pandas_utils import pandas_multi_index_to_columns
+
+        df = pd.DataFrame({"portfolio": ["A", "A", "B"], "asset": ["x", "y", "x"], "mv": [1.0, 2.0, 3.0]})
+        agg_df = df.groupby(["portfolio", "asset"])[["mv"]].sum()
+        result = pandas_multi_index_to_columns(agg_df)
+        self.assertEqual(result.columns.tolist(), ["portfolio", "asset", "mv"])
+        self.assertIsInstance(result.index, pd.RangeIndex)
+        cat_result = pandas_multi_index_to_columns(agg_df, as_categorical=True)
+        self.assertIsInstance(cat_result["portfolio"].dtype, pd.CategoricalDtype)
+        pd.testing.assert_frame_equal(cat_result.astype({"portfolio": object, "asset": object}),
+                                      result.astype({"portfolio": object, "asset": object}))
+
+    def test_pandas_series_multi_index_to_columns(self):
+        from sampytools.pandas_utils import pandas_series_multi_index_to_columns
+
+        df = pd.DataFrame({"portfolio": ["A", "A", "B"], "asset": ["x", "y", "x"], "mv": [1.0, 2.0, 3.0]})
+        agg_series = df.groupby(["portfolio", "asset"])["mv"].count()
+        result = pandas_series_multi_index_to_columns(agg_series)
+        self.assertEqual(result.columns.tolist(), ["portfolio", "asset", "count"])
+        cat_result = pandas_series_multi_index_to_columns(agg_series, as_categorical=True)
+        self.assertEqual(cat_result["asset"].astype(str).tolist(), result["asset"].astype(str).tolist())
+        self.assertEqual(cat_result["count"].tolist(), [1, 1, 1])
+
+    def test_convert_dataframe_to_wiki_table(self):
+        from sampytools.pandas_utils import convert_dataframe_to_wiki_table, compile_wiki_table_templates
+
+        df = pd.DataFrame({"name": ["one", "two"], "query": ["select 1", "select 2"]})
+        compile_wiki_table_templates.cache_clear()
+        table = convert_dataframe_to_wiki_table(df, code_col="query", col_styles={"query": 800, "name": 100})
+        self.assertIn('<col style="width:100px;"/><col style="width:800px;"/>', table)
+        self.assertIn("<tr><td>one</td><td><div", table)
+        self.assertIn("<![CDATA[select 2]]>", table)
+        convert_dataframe_to_wiki_table(df.iloc[1:], code_col="query", col_styles={"query": 800, "name": 100})
+        self.assertEqual(compile_wiki_table_templates.cache_info().hits, 1)
+
+    def test_extract_switches_values_to_dataframe(self):
+        from sampytools.pandas_utils import extract_switches_values_to_dataframe
+        from sampytools.text_utils import extract_switches_values
+
+        command_lines = pd.Series(
+            ["load.sh -d 20240101 -env prod", "noop", "load.sh -env dev -d 1 -d 2"], index=["x", "y", "z"]
+        )
+        result = extract_switches_values_to_dataframe(command_lines)
+        self.assertEqual(result.index.tolist(), ["x", "y", "z"])
+        self.assertEqual(sorted(result.columns), ["-d", "-env"])
+        self.assertEqual(result.loc["z"].to_dict(), extract_switches_values(command_lines["z"]))
+        self.assertTrue(result.loc["y"].isna().all())
+
     def test_read_csv_file_with_multiple_encodings_falls_back_to_cp932(self):
         with tempfile.TemporaryDirectory() as tmpdir:
             file_path = pathlib.Path(tmpdir) / "cp932.csv"
@@ -0,0 +1,282 @@
+import functools
+import gc
+import pickle
+import sys
+import threading
+import unittest
+
+from sampytools.configdict import ConfigDict, FrozenConfigDict, NominalToken
+
+
+class TestNominalToken(unittest.TestCase):
+
+    def test_tokens_are_interned(self):
+        token = NominalToken("INTERNED")
+        self.assertIs(NominalToken("INTERNED"), token)
+        self.assertEqual(token, NominalToken("INTERNED"))
+        self.assertNotEqual(token, NominalToken("OTHER"))
+        self.assertNotEqual(token, "INTERNED")
+        self.assertEqual(hash(token), hash("NominalToken" + "INTERNED"))
+        self.assertIs(pickle.loads(pickle.dumps(token)), token)
+        self.assertFalse(hasattr(token, "__dict__"))
+
+    def test_unused_tokens_are_released(self):
+        NominalToken("TEMPORARY")
+        gc.collect()
+        self.assertNotIn((NominalToken, "TEMPORARY"), NominalToken._registry)
+
+
+class TestConfigDict(unittest.TestCase):
+
+    def test_dotted_set_and_get(self):
+        config = ConfigDict({"db.host": "localhost", "db.port": 5432, "debug": True})
+        self.assertEqual(config["db.host"], "localhost")
+        self.assertEqual(config.db.port, 5432)
+        self.assertEqual(config["db"]["host"], "localhost")
+        self.assertEqual(len(config), 3)
+        self.assertIn("db", config)
+        self.assertIn("db.port", config)
+        self.assertEqual(config.flatten(), {"db.host": "localhost", "db.port": 5432, "debug": True})
+
+    def test_read_does_not_create_keys(self):
+        config = ConfigDict({"a": 1})
+        self.assertIsNone(config.get("x.y"))
+        _ = config.missing.deeper
+        self.assertNotIn("missing", config)
+        self.assertEqual(len(config), 1)
+        self.assertEqual(set(dir(config)), {"get", "flatten", "update", "subscribe", "freeze", "to_json", "to_yaml", "a"})
+
+    def test_chained_attribute_write_attaches_sub_dict(self):
+        config = ConfigDict()
+        config.x.y.z = 9
+        self.assertEqual(config["x.y.z"], 9)
+        self.assertIn("x.y.z", config)
+        self.assertEqual(config.x.flatten(), {"y.z": 9})
+
+    def test_writes_through_repeated_missing_reads_are_kept(self):
+        config = ConfigDict()
+        first, second = config.a, config.a
+        first.b = 1
+        second.c = 2
+        self.assertEqual(config.flatten(), {"a.b": 1, "a.c": 2})
+
+    def test_write_through_missing_read_after_key_was_created(self):
+        config = ConfigDict()
+        sub = config.a
+        config["a.b"] = 1
+        sub.c = 2
+        self.assertEqual(config.flatten(), {"a.b": 1, "a.c": 2})
+
+    def test_overwrite_and_delete_keep_index_in_sync(self):
+        config = ConfigDict({"a.b": 1, "a.c": 2})
+        config.a.d = 3
+        self.assertEqual(len(config), 3)
+        config.a = 5
+        self.assertEqual(config.flatten(), {"a": 5})
+        config["n"] = ConfigDict({"p": 1})
+        del config["n.p"]
+        self.assertEqual(config.flatten(), {"a": 5})
+
+    def test_nominal_token_keys_and_pickle(self):
+        token = NominalToken("T")
+        config = ConfigDict({"a.b": 1})
+        config[token] = 2
+        config.a[token] = 3
+        restored = pickle.loads(pickle.dumps(config))
+        self.assertEqual(restored.flatten(), config.flatten())
+        self.assertEqual(restored[token], 2)
+        restored.a.b = 10
+        self.assertEqual(restored["a.b"], 10)
+        self.assertEqual(config["a.b"], 1)
+
+
+class TestConfigDictConcurrency(unittest.TestCase):
+
+    def test_update_is_atomic_for_readers(self):
+        config = ConfigDict({"a": 0, "b": 0})
+        stop = threading.Event()
+        inconsistent = []
+
+        def read():
+            while not stop.is_set():
+                values = config.flatten()
+                if values["a"] != values["b"]:
+                    inconsistent.append(values)
+
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        readers = [threading.Thread(target=read) for _ in range(4)]
+        try:
+            for reader in readers:
+                reader.start()
+            for i in range(2000):
+                config.update({"a": i, "b": i})
+        finally:
+            stop.set()
+            for reader in readers:
+                reader.join()
+            sys.setswitchinterval(switch_interval)
+        self.assertEqual(inconsistent, [])
+        self.assertEqual(config.flatten(), {"a": 1999, "b": 1999})
+
+    def test_serialization_while_keys_are_set_and_deleted(self):
+        config = ConfigDict({f"k{i}.v": i for i in range(50)})
+        stop = threading.Event()
+        errors = []
+
+        def read():
+            while not stop.is_set():
+                try:
+                    config.to_json()
+                    dir(config)
+                    pickle.dumps(config)
+                    repr(config)
+                except Exception as e:
+                    errors.append(e)
+
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        readers = [threading.Thread(target=read) for _ in range(3)]
+        try:
+            for reader in readers:
+                reader.start()
+            for i in range(2000):
+                config[f"n{i % 20}.v"] = i
+                del config[f"n{(i + 10) % 20}"]
+        finally:
+            stop.set()
+            for reader in readers:
+                reader.join()
+            sys.setswitchinterval(switch_interval)
+        self.assertEqual(errors, [])
+
+    def test_update_of_sub_dict(self):
+        config = ConfigDict({"db.host": "a", "x": 0})
+        config.db.update({"port": 1})
+        self.assertEqual(config.flatten(), {"db.host": "a", "db.port": 1, "x": 0})
+
+    def test_sub_dict_fetched_before_update_stays_in_tree(self):
+        config = ConfigDict({"db.host": "old", "db.port": 1})
+        db = config.db
+        config.update({"db.host": "new"})
+        self.assertEqual(db.host, "new")
+        db.port = 5
+        db.update({"user": "u"})
+        self.assertEqual(config.flatten(), {"db.host": "new", "db.port": 5, "db.user": "u"})
+
+    def test_sub_dict_fetched_from_missing_key_before_update_stays_in_tree(self):
+        config = ConfigDict({"x": 1})
+        db, opts = config.db, config.a.b
+        config.update({"db.host": "h", "a.b.c": 2})
+        self.assertEqual(db.get("host"), "h")
+        self.assertIn("host", db)
+        self.assertIs(config.a.b, opts)
+        db.port = 5
+        self.assertEqual(config.flatten(), {"x": 1, "db.host": "h", "db.port": 5, "a.b.c": 2})
+
+    def test_update_of_sub_dict_fetched_from_missing_key(self):
+        config = ConfigDict({"x": 1})
+        sub = config.m
+        sub.update({"k": 1})
+        self.assertEqual(sub.get("k"), 1)
+        self.assertIs(config.m, sub)
+        self.assertEqual(config.flatten(), {"x": 1, "m.k": 1})
+
+    def test_subscribers_are_not_called_for_lazy_conversion(self):
+        config = ConfigDict.from_json('{"a": {"b": 1}}', lazy=True)
+        changes = []
+        config.subscribe("a", lambda *change: changes.append(change))
+        config["a.c"] = 2
+        self.assertEqual(changes, [("a.c", None, 2)])
+
+    def test_subscribers_get_changes_at_or_under_path(self):
+        config = ConfigDict({"db.host": "a", "db.port": 1, "x": 0})
+        db_changes, port_changes = [], []
+        unsubscribe = config.subscribe("db", lambda *change: db_changes.append(change))
+        config.db.subscribe("port", lambda *change: port_changes.append(change))
+        config.update({"db.host": "b", "db.port": 1, "x": 5})
+        config["db.port"] = 2
+        del config["db.host"]
+        self.assertEqual(db_changes, [("db.host", "a", "b"), ("db.port", 1, 2), ("db.host", "b", None)])
+        self.assertEqual(port_changes, [("db.port", 1, 2)])
+        unsubscribe()
+        config["db.port"] = 3
+        self.assertEqual(len(db_changes), 3)
+        self.assertEqual(len(port_changes), 2)
+
+
+class TestFrozenConfigDict(unittest.TestCase):
+
+    def test_snapshot_is_independent_and_immutable(self):
+        config = ConfigDict({"a.b": 1, "a.c.d": 2, "e": 3})
+        frozen = config.freeze()
+        config.e = 30
+        self.assertEqual(frozen.e, 3)
+        self.assertEqual(frozen.a.c.d, 2)
+        self.assertIsInstance(frozen["a"], FrozenConfigDict)
+        self.assertIn("a.c", frozen)
+        self.assertEqual(len(frozen), 3)
+        with self.assertRaises(TypeError):
+            frozen.e = 4
+        with self.assertRaises(TypeError):
+            frozen.flatten()["e"] = 4
+        with self.assertRaises(AttributeError):
+            _ = frozen.missing
+        self.assertEqual(frozen.thaw().flatten(), {"a.b": 1, "a.c.d": 2, "e": 3})
+
+    def test_hash_equality_and_pickle(self):
+        frozen = ConfigDict({"a.b": 1, "e": 3}).freeze()
+        same = ConfigDict({"e": 3, "a.b": 1}).freeze()
+        self.assertEqual(frozen, same)
+        self.assertEqual(hash(frozen), hash(same))
+        self.assertEqual(pickle.loads(pickle.dumps(frozen)), frozen)
+
+        @functools.lru_cache(maxsize=None)
+        def double_e(config):
+            return config.e * 2
+
+        self.assertEqual(double_e(frozen), 6)
+        self.assertEqual(double_e(same), 6)
+        self.assertEqual(double_e.cache_info().hits, 1)
+
+
+class TestConfigDictSerialization(unittest.TestCase):
+    document = '{"name": "svc", "db": {"host": "h", "port": 1, "opts": {"ssl": true}}, "ref": {"ids": [1, 2]}}'
+
+    def test_from_json_builds_sub_dicts(self):
+        config = ConfigDict.from_json(self.document)
+        self.assertEqual(config.db.opts.ssl, True)
+        self.assertEqual(
+            config.flatten(), {"name": "svc", "db.host": "h", "db.port": 1, "db.opts.ssl": True, "ref.ids": [1, 2]}
+        )
+        self.assertEqual(ConfigDict.from_json(config.to_json()).flatten(), config.flatten())
+
+    def test_lazy_from_json_converts_sub_trees_on_access(self):
+        eager = ConfigDict.from_json(self.document)
+        config = ConfigDict.from_json(self.document, lazy=True)
+        self.assertEqual(config.get("db.host"), "h")
+        self.assertEqual(config["ref.ids"], [1, 2])
+        self.assertEqual(config.to_json(), eager.to_json())
+        self.assertEqual(len(config), len(eager))
+        self.assertEqual(config.flatten(), eager.flatten())
+
+    def test_lazy_sub_trees_can_be_overwritten_before_access(self):
+        config = ConfigDict.from_json(self.document, lazy=True)
+        config.db = 5
+        del config["ref"]
+        self.assertEqual(config.flatten(), {"name": "svc", "db": 5})
+
+    def test_to_json_converts_non_string_keys(self):
+        self.assertEqual(ConfigDict({"m": {1: "x"}}).to_json(), '{"m":{"1":"x"}}')
+
+    def test_from_json_rejects_non_objects(self):
+        with self.assertRaises(ValueError):
+            ConfigDict.from_json("[1, 2]")
+
+    def test_yaml_round_trip(self):
+        config = ConfigDict.from_json(self.document)
+        self.assertEqual(ConfigDict.from_yaml(config.to_yaml()).flatten(), config.flatten())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,7 @@
 import re
 import unittest
 
-from sampytools.text_utils import extract_words_from_text_and_join_with_char
+from sampytools.text_utils import extract_words_from_text_and_join_with_char, normalize_text_to_words_joined_with_char
 
 class TestExtractWordsAndJoin(unittest.TestCase):
 
@@ -29,5 +29,18 @@ class TestExtractWordsAndJoin(unittest.TestCase):
         result = extract_words_from_text_and_join_with_char("Multiple   spaces here", join_char=" ")
         self.assertEqual(result, "Multiple spaces here")
 
+    def test_repeated_text_hits_cache(self):
+        normalize_text_to_words_joined_with_char.cache_clear()
+        extract_words_from_text_and_join_with_char("Market Value (USD)")
+        result = extract_words_from_text_and_join_with_char("Market Value (USD)")
+        self.assertEqual(result, "Market_Value_USD")
+        cache_info = normalize_text_to_words_joined_with_char.cache_info()
+        self.assertEqual(cache_info.hits, 1)
+        self.assertEqual(cache_info.misses, 1)
+
+    def test_lowercase(self):
+        result = normalize_text_to_words_joined_with_char("Market Value", lowercase=True)
+        self.assertEqual(result, "market_value")
+
 if __name__ == '__main__':
     unittest.main()
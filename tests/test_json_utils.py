@@ -1,11 +1,24 @@
+import gzip
+import math
+import tempfile
 import unittest
+from unittest import mock
 import pathlib
 import json
 from typing import Dict
 
 # Assume the target function is in json_utils.py
 # Adjust the import based on your project structure
-from sampytools.json_utils import read_json_file
+from sampytools import json_utils
+from sampytools.json_utils import (
+    read_json_file,
+    loads_json,
+    dumps_json,
+    iterate_json_records,
+    iterate_json_record_batches,
+    iterate_json_dataframes,
+    read_json_files_to_dataframe,
+)
 
 
 class TestReadJsonFile(unittest.TestCase):
@@ -38,5 +51,113 @@ class TestReadJsonFile(unittest.TestCase):
             self.test_dir.rmdir()
 
 
+class TestLoadsDumpsJson(unittest.TestCase):
+    data = {"name": "Subkhon", "nested": {"ids": [1, 2]}, "text": "héllo"}
+
+    def test_round_trip(self):
+        self.assertEqual(loads_json(dumps_json(self.data)), self.data)
+        self.assertEqual(loads_json(dumps_json(self.data, indent=True).encode("utf-8")), self.data)
+
+    def test_round_trip_without_orjson(self):
+        with mock.patch.object(json_utils, "orjson", None):
+            self.assertEqual(loads_json(dumps_json(self.data)), self.data)
+            self.assertEqual(json.loads(dumps_json(self.data, indent=True)), self.data)
+
+    def test_backends_agree(self):
+        data = {"m": {1: "x", None: "y"}, "text": "héllo", "empty": {}}
+        with_orjson = [dumps_json(data), dumps_json(data, indent=True)]
+        with mock.patch.object(json_utils, "orjson", None):
+            without_orjson = [dumps_json(data), dumps_json(data, indent=True)]
+        self.assertEqual(with_orjson, without_orjson)
+        self.assertEqual(with_orjson[0], '{"m":{"1":"x","null":"y"},"text":"héllo","empty":{}}')
+
+    def test_nan_and_infinity_with_both_backends(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            json_file = pathlib.Path(tmpdir) / "nan.json"
+            json_file.write_text('{"x": NaN, "y": -Infinity}', encoding="utf-8")
+            for orjson_module in (json_utils.orjson, None):
+                with mock.patch.object(json_utils, "orjson", orjson_module):
+                    result = read_json_file(json_file)
+                    self.assertTrue(math.isnan(result["x"]))
+                    self.assertEqual(result["y"], float("-inf"))
+                    with self.assertRaises(json.JSONDecodeError):
+                        loads_json("{broken")
+
+
+class TestIterateJsonRecords(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.folder = pathlib.Path(self.temp_dir.name)
+        self.records = [{"id": i, "text": 'a,]b["c' * (i % 3), "values": [i, i * 0.5]} for i in range(25)]
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_json_array_split_across_chunks(self):
+        json_file = self.folder / "records.json"
+        json_file.write_text(json.dumps(self.records + [1234567, None, []], indent=2), encoding="utf-8")
+        for chunk_size in (1, 3, 64):
+            result = list(iterate_json_records(json_file, chunk_size=chunk_size))
+            self.assertEqual(result, self.records + [1234567, None, []])
+
+    def test_json_array_of_numbers_split_across_chunks(self):
+        json_file = self.folder / "numbers.json"
+        numbers = [1.5, 2.25, 3e10, 12.75, 1e-3, -0.5, 7]
+        json_file.write_text(json.dumps(numbers), encoding="utf-8")
+        for chunk_size in range(1, 12):
+            self.assertEqual(list(iterate_json_records(json_file, chunk_size=chunk_size)), numbers)
+        batches = list(iterate_json_record_batches(json_file, batch_size=3, chunk_size=2))
+        self.assertEqual(batches, [numbers[:3], numbers[3:6], numbers[6:]])
+
+    def test_json_lines_gzip_and_inferred_format(self):
+        gz_file = self.folder / "records.jsonl.gz"
+        with gzip.open(gz_file, "wt", encoding="utf-8") as f:
+            f.write("\n".join(json.dumps(r) for r in self.records) + "\n\n")
+        self.assertEqual(list(iterate_json_records(gz_file)), self.records)
+        txt_file = self.folder / "records.txt"
+        txt_file.write_text("\n".join(json.dumps(r) for r in self.records[:3]), encoding="utf-8")
+        self.assertEqual(list(iterate_json_records(txt_file)), self.records[:3])
+
+    def test_invalid_array_raises(self):
+        json_file = self.folder / "bad.json"
+        json_file.write_text("[1 2]", encoding="utf-8")
+        with self.assertRaises(ValueError):
+            list(iterate_json_records(json_file))
+
+    def test_batches_and_dataframes(self):
+        json_file = self.folder / "records.json"
+        json_file.write_text(json.dumps(self.records), encoding="utf-8")
+        self.assertEqual([len(batch) for batch in iterate_json_record_batches(json_file, batch_size=10)], [10, 10, 5])
+        dataframes = list(iterate_json_dataframes(json_file, batch_size=10))
+        self.assertEqual([len(df) for df in dataframes], [10, 10, 5])
+        self.assertEqual(dataframes[2]["id"].tolist(), [20, 21, 22, 23, 24])
+
+
+class TestReadJsonFilesToDataframe(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.folder = pathlib.Path(self.temp_dir.name)
+        (self.folder / "a.json").write_text(json.dumps([{"a": 1, "b": "x"}, {"a": 2}]), encoding="utf-8")
+        with gzip.open(self.folder / "b.jsonl.gz", "wt", encoding="utf-8") as f:
+            f.write('{"a": 3, "c": 1.5}\n{"a": 4}\n')
+        (self.folder / "c.jsonl").write_text('{"a": 5}\n{broken\n', encoding="utf-8")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_parallel_read_concatenates_and_reports_errors(self):
+        result = read_json_files_to_dataframe(self.folder, n_jobs=2, source_col_name="source")
+        self.assertEqual(result.dataframe["a"].tolist(), [1, 2, 3, 4])
+        self.assertEqual(result.dataframe["source"].tolist(), ["a.json", "a.json", "b.jsonl.gz", "b.jsonl.gz"])
+        self.assertEqual(result.file_stats["rows"].tolist(), [2, 2, 0])
+        self.assertEqual(list(result.errors), [str(self.folder / "c.jsonl")])
+
+    def test_in_process_read_matches_parallel_read(self):
+        files = sorted(self.folder.glob("*.json*"))
+        in_process = read_json_files_to_dataframe(files)
+        parallel = read_json_files_to_dataframe(files, n_jobs=2)
+        self.assertTrue(in_process.dataframe.equals(parallel.dataframe))
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+
+import numpy as np
+
+from sampytools.set_utils import (
+    ordered_diff,
+    ordered_intersection,
+    ordered_union,
+    ordered_symmetric_difference,
+    multiset_diff,
+    multiset_intersection,
+    multiset_union,
+)
+
+
+class TestOrderedSetOperations(unittest.TestCase):
+
+    def setUp(self):
+        self.list_one = ["c", "a", "b", "a", "d"]
+        self.list_two = ["b", "e", "c", "f", "e"]
+
+    def test_ordered_diff(self):
+        self.assertEqual(ordered_diff(self.list_one, self.list_two), ["a", "d"])
+
+    def test_ordered_intersection(self):
+        self.assertEqual(ordered_intersection(self.list_one, self.list_two), ["c", "b"])
+
+    def test_ordered_union(self):
+        self.assertEqual(ordered_union(self.list_one, self.list_two), ["c", "a", "b", "d", "e", "f"])
+
+    def test_ordered_symmetric_difference(self):
+        self.assertEqual(ordered_symmetric_difference(self.list_one, self.list_two), ["a", "d", "e", "f"])
+
+    def test_numpy_fast_path_matches_list_path(self):
+        for arr_one, arr_two in [
+            (np.array(self.list_one), np.array(self.list_two)),
+            (np.array([5, 1, 3, 1, 7]), np.array([3, 9, 5, 2, 9])),
+        ]:
+            for operation in [ordered_diff, ordered_intersection, ordered_union, ordered_symmetric_difference]:
+                result = operation(arr_one, arr_two)
+                self.assertIsInstance(result, np.ndarray)
+                self.assertEqual(result.tolist(), operation(arr_one.tolist(), arr_two.tolist()))
+
+
+class TestMultisetOperations(unittest.TestCase):
+
+    def test_multiset_diff(self):
+        self.assertEqual(multiset_diff([1, 1, 2, 3], [1, 3]), [1, 2])
+
+    def test_multiset_intersection(self):
+        self.assertEqual(multiset_intersection([1, 1, 2, 3], [1, 3, 3]), [1, 3])
+
+    def test_multiset_union(self):
+        self.assertEqual(multiset_union([1, 1, 2], [1, 3, 3]), [1, 1, 2, 3, 3])
+
+
+if __name__ == "__main__":
+    unittest.main()
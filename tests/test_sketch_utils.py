@@ -0,0 +1,103 @@
+import unittest
+import tempfile
+import pathlib
+
+import numpy as np
+import pandas as pd
+
+from sampytools.sketch_utils import (
+    HyperLogLog,
+    CountMinSketch,
+    SpaceSaving,
+    StreamingGroupProfile,
+    approximate_distinct_count,
+    profile_group_counts_in_csv_file,
+)
+
+
+class TestHyperLogLog(unittest.TestCase):
+
+    def test_count_is_within_error_bound(self):
+        hll = HyperLogLog(relative_error=0.01)
+        hll.update(list(range(100_000)))
+        self.assertLess(abs(hll.count() - 100_000), 100_000 * 5 * hll.relative_error)
+
+    def test_small_cardinality(self):
+        hll = HyperLogLog()
+        hll.update(["one", "two", "two", "three"])
+        self.assertEqual(hll.count(), 3)
+
+    def test_merge(self):
+        one, two = HyperLogLog(), HyperLogLog()
+        one.update(list(range(1000)))
+        two.update(list(range(500, 1500)))
+        one.merge(two)
+        self.assertLess(abs(one.count() - 1500), 1500 * 5 * one.relative_error)
+
+    def test_unreachable_relative_error_raises(self):
+        self.assertEqual(HyperLogLog(0.0021).precision, 18)
+        for relative_error in (0.002, 0.0, -0.1):
+            with self.assertRaises(ValueError):
+                HyperLogLog(relative_error)
+
+    def test_merge_different_precision_raises(self):
+        with self.assertRaises(ValueError):
+            HyperLogLog(0.01).merge(HyperLogLog(0.05))
+
+    def test_approximate_distinct_count(self):
+        dicts = [{"name": "one", "price": 1}, {"name": "two", "qty": 2}]
+        keys = (key for thedict in dicts for key in thedict)
+        self.assertEqual(approximate_distinct_count(keys, batch_size=2), 3)
+
+
+class TestCountMinAndSpaceSaving(unittest.TestCase):
+
+    def test_count_min_never_undercounts(self):
+        values = pd.Series(np.random.default_rng(0).integers(0, 500, 10_000))
+        cms = CountMinSketch(epsilon=0.01, delta=0.01)
+        cms.update_counts(values.value_counts())
+        exact = values.value_counts()
+        estimates = cms.estimate(exact.index)
+        self.assertTrue((estimates >= exact.to_numpy()).all())
+        self.assertTrue((estimates - exact.to_numpy() <= cms.epsilon * cms.total).mean() > 0.95)
+
+    def test_space_saving_finds_heavy_hitters(self):
+        values = ["a"] * 50 + ["b"] * 30 + [f"noise{i}" for i in range(100)]
+        summary = SpaceSaving(capacity=10)
+        for i in range(0, len(values), 20):
+            summary.update(values[i:i + 20])
+        top = summary.top_k(2)
+        self.assertEqual([key for key, _, _ in top], ["a", "b"])
+        for key, count, error in top:
+            self.assertLessEqual(count - error, values.count(key))
+            self.assertGreaterEqual(count, values.count(key))
+
+
+class TestStreamingGroupProfile(unittest.TestCase):
+
+    def setUp(self):
+        self.df = pd.DataFrame({
+            "portfolio": ["A"] * 6 + ["B"] * 3 + ["C"],
+            "asset": ["x", "x", "x", "y", "y", "z", "x", "x", "y", "x"],
+        })
+
+    def test_profile_from_chunks(self):
+        profile = StreamingGroupProfile(["portfolio", "asset"])
+        profile.update_from_chunks(self.df.iloc[i:i + 3] for i in range(0, len(self.df), 3))
+        self.assertEqual(profile.row_count, 10)
+        self.assertEqual(profile.distinct_count(), 6)
+        top = profile.top_k(2)
+        self.assertEqual(top.index.tolist(), [("A", "x"), ("A", "y")])
+        self.assertEqual(top.tolist(), [3, 2])
+
+    def test_profile_group_counts_in_csv_file(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            file_path = pathlib.Path(tmpdir) / "breaks.csv"
+            self.df.to_csv(file_path, index=False)
+            profile = profile_group_counts_in_csv_file(file_path, "portfolio", chunksize=4)
+        self.assertEqual(profile.distinct_count(), 3)
+        self.assertEqual(profile.top_k(1).to_dict(), {"A": 6})
+
+
+if __name__ == "__main__":
+    unittest.main()
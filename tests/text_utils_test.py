@@ -61,6 +61,26 @@ class MyTestCase(unittest.TestCase):
         print(df.to_string())
         self.assertTrue("portfolio_name" in df.columns)
 
+    def test_get_sorted_non_zero_words_and_freqs_from_csr_mat(self):
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sampytools.text_utils import (
+            get_sorted_non_zero_words_and_freqs_from_csr_mat,
+            get_sorted_non_zero_words_and_freqs_from_csr_mat_row,
+        )
+
+        messages = ["error reading file abc", "error reading file xyz error", "database failed on port"]
+        tfidf = TfidfVectorizer()
+        csr_mat = tfidf.fit_transform(messages)
+        tfidf_features = tfidf.get_feature_names_out()
+        row_items = get_sorted_non_zero_words_and_freqs_from_csr_mat_row(csr_mat[1], tfidf_features)
+        self.assertEqual([word for word, freq in row_items][-1], "error")
+        self.assertEqual(sorted(word for word, freq in row_items), ["error", "file", "reading", "xyz"])
+        self.assertTrue(all(one[1] <= two[1] for one, two in zip(row_items, row_items[1:])))
+        batch_items = get_sorted_non_zero_words_and_freqs_from_csr_mat(csr_mat, tfidf_features)
+        self.assertEqual(batch_items[1], row_items)
+        top_items = get_sorted_non_zero_words_and_freqs_from_csr_mat(csr_mat, tfidf_features, top_n=2)
+        self.assertEqual(top_items[1], row_items[-2:])
+
     def test_get_message_clusters(self):
         from sampytools.text_utils import get_message_clusters
 
@@ -100,6 +120,199 @@ class MyTestCase(unittest.TestCase):
         self.assertEqual(len(tfidf_features), result['tfidf'].idf_.shape[0])
 
 
+    def test_get_message_clusters_with_minibatch_nmf(self):
+        from sampytools.text_utils import get_message_clusters
+
+        messages = [
+            "Error while reading file /data/abc.txt",
+            "Error while reading file /data/abc.txt",
+            "Error while reading file /data/xyz.txt",
+            "Connection to database failed at port 5432",
+            "User login failed due to wrong credentials",
+        ]
+        result = get_message_clusters(messages, n_components=2, use_minibatch_nmf=True, batch_size=2,
+                                      algorithm="ball_tree")
+        self.assertEqual(result['nmf_feature'].shape, (len(messages), 2))
+        self.assertTrue(set(result['clustered_messages'].keys()) <= set(messages))
+        self.assertIn("Error while reading file /data/abc.txt", result['clustered_messages'])
+
+    def test_online_message_clusterer(self):
+        import tempfile
+        from sampytools.text_utils import OnlineMessageClusterer
+
+        messages = [f"Error while reading file /data/{idx}.txt" for idx in range(20)]
+        messages += [f"Connection to database failed at port {5000 + idx}" for idx in range(20)]
+        clusterer = OnlineMessageClusterer(n_components=2, batch_size=8)
+        clusterer.partial_fit(messages)
+        clustered_messages = clusterer.assign(messages)
+        self.assertEqual(len(clustered_messages), len(messages))
+        self.assertEqual(clusterer.n_clusters, 2)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            clusterer.save(pathlib.Path(tmpdir))
+            restored = OnlineMessageClusterer.load(pathlib.Path(tmpdir))
+            new_messages = ["Error while reading file /data/new.txt"]
+            self.assertEqual(restored.assign(new_messages, create_clusters=False),
+                             clusterer.assign(new_messages, create_clusters=False))
+            self.assertEqual(restored.n_clusters, 2)
+            del restored
+
+    def test_get_message_templates(self):
+        from sampytools.text_utils import get_message_templates
+
+        messages = [
+            "Error while reading file /data/abc.txt",
+            "Error while reading file /data/xyz.txt",
+            "Connection to database failed at port 5432",
+            "User 12 logged in from 10.0.0.1",
+            "User 15 logged in from 10.0.0.2",
+            "",
+            "",
+        ]
+        result = get_message_templates(messages)
+        clustered_messages = result['clustered_messages']
+        self.assertEqual(set(clustered_messages.keys()), set(messages))
+        self.assertEqual(clustered_messages["Error while reading file /data/xyz.txt"], "Error while reading file <*>")
+        self.assertEqual(clustered_messages["Connection to database failed at port 5432"],
+                         "Connection to database failed at port <*>")
+        self.assertEqual(clustered_messages["User 12 logged in from 10.0.0.1"], "User <*> logged in from <*>")
+        self.assertEqual(len(set(result['message_template_ids'].values())), 4)
+
+    def test_remove_duplicate_lines_in_large_file(self):
+        import tempfile
+        from sampytools.text_utils import remove_duplicate_lines_in_text, remove_duplicate_lines_in_large_file
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            original_file = pathlib.Path(tmpdir) / "app.log"
+            original_file.write_text("one\ntwo\none\nthree\ntwo\n")
+            expected = remove_duplicate_lines_in_text(original_file, "expected.log")
+            result = remove_duplicate_lines_in_large_file(original_file, keep_counts=True)
+            self.assertEqual(result.new_file.read_text(), expected.new_file.read_text())
+            self.assertEqual(result.newtxtcnt, expected.newtxtcnt)
+            self.assertEqual((result.line_count, result.unique_line_count), (6, 4))
+            external = remove_duplicate_lines_in_large_file(original_file, "external.log", external_sort=True,
+                                                            n_partitions=2, temp_folder=pathlib.Path(tmpdir))
+            self.assertEqual(external.new_file.read_text(), expected.new_file.read_text())
+            self.assertEqual(external.unique_line_count, 4)
+
+    def test_compare_two_large_files(self):
+        import tempfile
+        from sampytools.text_utils import compare_two_large_files, iterate_file_diff
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            file_one = pathlib.Path(tmpdir) / "one.txt"
+            file_two = pathlib.Path(tmpdir) / "two.txt"
+            file_one.write_text("a\nb\nc\nb\nd")
+            file_two.write_text("b\nd\ne")
+            self.assertEqual(list(iterate_file_diff(file_one, file_two)), ["a", "c"])
+            self.assertEqual(list(iterate_file_diff(file_one, file_two, external_sort=True, n_partitions=2)),
+                             ["a", "c"])
+            result = compare_two_large_files(file_one, file_two, pathlib.Path(tmpdir) / "diff", external_sort=True)
+            self.assertEqual(result.file1_vs_file2.read_text(), "a\nc")
+            self.assertEqual(result.file2_vs_file1.read_text(), "e")
+            self.assertEqual(result.intersection.read_text(), "b\nd")
+            self.assertEqual(result.intersection_count, 2)
+
+    def test_iterate_delimited_records_from_file(self):
+        import tempfile
+        from collections import Counter
+        from sampytools.text_utils import get_delimited_records_from_file, iterate_delimited_records_from_file
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            testfile = pathlib.Path(tmpdir) / "delimited_text.txt"
+            testfile.write_text("one\ttwo\n\nthree\tfour\nfive\n")
+            self.assertEqual(get_delimited_records_from_file(testfile), [["one", "two"], ["three", "four"], ["five"]])
+            field_counts = Counter()
+            records = list(iterate_delimited_records_from_file(
+                testfile, expected_field_count=2, on_bad_record="skip", field_counts=field_counts
+            ))
+            self.assertEqual(records, [["one", "two"], ["three", "four"]])
+            self.assertEqual(field_counts, Counter({2: 2, 1: 1}))
+            with self.assertRaises(ValueError):
+                list(iterate_delimited_records_from_file(testfile, expected_field_count=2))
+            testfile.write_text('name,comment\none,"quoted, with comma"\n')
+            records = list(iterate_delimited_records_from_file(testfile, ",", quotechar='"'))
+            self.assertEqual(records[1], ["one", "quoted, with comma"])
+
+    def test_get_delimited_records_from_file_with_multibyte_encodings(self):
+        import tempfile
+        from sampytools.text_utils import get_delimited_records_from_file
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            testfile = pathlib.Path(tmpdir) / "delimited_text.txt"
+            for encoding in ("utf-16", "utf-8-sig", "cp932"):
+                testfile.write_text("名前\t値\n\nthree\tfour\n", encoding=encoding)
+                self.assertEqual(
+                    get_delimited_records_from_file(testfile, encoding=encoding),
+                    [["名前", "値"], ["three", "four"]],
+                )
+
+    def test_write_lines_to_file(self):
+        import gzip
+        import tempfile
+        from sampytools.text_utils import write_lines_to_file, split_text_by_certain_substring_and_save
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            plain_file = pathlib.Path(tmpdir) / "lines.txt"
+            line_count = write_lines_to_file(plain_file, (f"line {idx}" for idx in range(3)))
+            self.assertEqual(line_count, 3)
+            self.assertEqual(plain_file.read_text(), "line 0\nline 1\nline 2")
+            gz_file = pathlib.Path(tmpdir) / "lines.txt.gz"
+            write_lines_to_file(gz_file, ["one", "two"], compression="infer")
+            with gzip.open(gz_file, "rt") as f:
+                self.assertEqual(f.read(), "one\ntwo")
+            split_file = pathlib.Path(tmpdir) / "split.txt"
+            parts = split_text_by_certain_substring_and_save("one;two", ";", split_file)
+            self.assertEqual(parts, ["one", "two"])
+            self.assertEqual(split_file.read_text(), "one\n\ntwo")
+
+    def test_format_sql_query(self):
+        from sampytools.text_utils import format_sql_query
+
+        keywords = ["SELECT", "FROM", "WHERE", "ORDER BY"]
+        query = "SELECT a FROM t WHERE x = 'ORDER BY' -- FROM here\nORDER BY a"
+        formatted = format_sql_query(keywords, query)
+        self.assertEqual(
+            formatted,
+            "\nSELECT\n\t a \nFROM\n\t t \nWHERE\n\t x = 'ORDER BY' -- FROM here\n\nORDER BY\n\t a",
+        )
+        self.assertEqual(format_sql_query(["from"], "select x From y", ignore_case=True), "select x \nfrom\n\t y")
+
+    def test_line_index(self):
+        import tempfile
+        from sampytools.text_utils import LineIndex, extract_subtext_from_big_text
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            log_file = pathlib.Path(tmpdir) / "big.log"
+            log_file.write_text("header\nSTART\none\ntwo\nEND\nSTART\nfooter\n")
+            lines = log_file.read_text().split("\n")
+            with LineIndex(log_file) as line_index:
+                self.assertEqual(len(line_index), len(lines))
+                self.assertEqual(line_index.positions["START"], [1, 5])
+                self.assertEqual(line_index.get_section_boundaries("START", "END"), (1, 4))
+                self.assertEqual(extract_subtext_from_big_text(line_index, "START", "END"),
+                                 extract_subtext_from_big_text(lines, "START", "END"))
+                self.assertEqual(line_index.index("START", start=2), 5)
+
+    def test_line_index_encodings(self):
+        import tempfile
+        from sampytools.text_utils import LineIndex
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            log_file = pathlib.Path(tmpdir) / "big.log"
+            log_file.write_text("héader\nSTART\nend", encoding="utf-8-sig")
+            with LineIndex(log_file, encoding="utf-8-sig") as line_index:
+                self.assertEqual(list(line_index.iter_lines()), ["héader", "START", "end"])
+            log_file.write_text("héader\nSTART\nend", encoding="utf-16")
+            with self.assertRaises(ValueError):
+                LineIndex(log_file, encoding="utf-16")
+
+    def test_extract_lines_that_match_pattern(self):
+        from sampytools.text_utils import extract_lines_that_match_pattern
+
+        lines = ["job=load status=ok", "no status here", "job=load status=failed"]
+        self.assertEqual(extract_lines_that_match_pattern(lines, r"status=\w+", "status=failed"),
+                         ["job=load status=failed"])
+
 
 if __name__ == "__main__":
     unittest.main()